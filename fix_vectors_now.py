@@ -7,6 +7,7 @@ import httpx
 import json
 import re
 import hashlib
+import functools
 from typing import Dict, List, Any
 
 REDIS_URL = "https://upright-jaybird-27907.upstash.io"
@@ -22,6 +23,10 @@ async def redis_cmd(*args) -> Any:
         )
         return r.json().get("result")
 
+@functools.lru_cache(maxsize=65536)
+def _word_index(word: str) -> int:
+    return int.from_bytes(hashlib.md5(word.encode()).digest()[:4], "big") % 30000
+
 def extract_sparse(text: str) -> Dict[str, List]:
     if not text:
         return {"indices": [], "values": [], "terms": []}
@@ -33,7 +38,7 @@ def extract_sparse(text: str) -> Dict[str, List]:
     
     indices, values, terms = [], [], []
     for word, freq in sorted(word_freq.items(), key=lambda x: -x[1])[:100]:
-        idx = int(hashlib.md5(word.encode()).hexdigest()[:8], 16) % 30000
+        idx = _word_index(word)
         indices.append(idx)
         values.append(float(freq))
         terms.append(word)
@@ -77,8 +82,14 @@ async def scan_keys(pattern: str) -> List[str]:
             break
     return keys
 
-async def fix_vector(key: str) -> Dict:
-    raw = await redis_cmd("GET", key)
+async def mget(keys: List[str], batch: int = 500) -> List[Any]:
+    values = []
+    for i in range(0, len(keys), batch):
+        chunk = keys[i:i + batch]
+        values.extend(await redis_cmd("MGET", *chunk) or [None] * len(chunk))
+    return values
+
+async def fix_vector(key: str, raw: Any) -> Dict:
     if not raw:
         return {"key": key, "status": "not_found"}
     
@@ -96,7 +107,7 @@ async def fix_vector(key: str) -> Dict:
     
     # Check if already has sparse
     sparse_existing = data.get("sparse")
-    if isinstance(sparse_existing, dict) and sparse_existing.get("indices"):
+    if isinstance(sparse_existing, dict) and (sparse_existing.get("indices") or sparse_existing.get("indices_b64")):
         return {"key": key, "status": "already_has_sparse"}
     
     # Extract text
@@ -153,11 +164,12 @@ async def main():
         print(f"\nScanning {pattern}...")
         keys = await scan_keys(pattern)
         print(f"  Found {len(keys)} keys")
+        raws = await mget(keys)
         
-        for key in keys:
+        for key, raw in zip(keys, raws):
             stats["scanned"] += 1
             try:
-                result = await fix_vector(key)
+                result = await fix_vector(key, raw)
                 
                 if result["status"] == "fixed":
                     stats["fixed"] += 1
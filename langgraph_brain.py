@@ -122,6 +122,19 @@ async def redis_cmd(*args):
     except:
         return None
 
+async def redis_pipeline(cmds: List[List]) -> List[Any]:
+    if not cmds:
+        return []
+    try:
+        async with httpx.AsyncClient() as c:
+            r = await c.post(f"{REDIS_URL}/pipeline", headers={"Authorization": f"Bearer {REDIS_TOKEN}"}, json=cmds, timeout=5)
+            body = r.json()
+    except (httpx.HTTPError, ValueError):
+        return [None] * len(cmds)
+    if not isinstance(body, list):
+        return [None] * len(cmds)
+    return [item.get("result") for item in body]
+
 async def cache_get(key: str) -> Any:
     result = await redis_cmd("GET", key)
     if result:
@@ -419,6 +432,9 @@ CYCLE_COUNTER_KEY = "ada:brain:cycle_count"
 LAST_HEARTBEAT_KEY = "ada:brain:last_heartbeat"
 PENDING_BATCH_KEY = "ada:brain:pending_batch"
 FAILBACK_THRESHOLD = 3  # cycles before failback
+# langgraph_receiver writes the same list; keep its cap in step
+WHISPER_LIST_KEY = "ada:whispers"
+WHISPER_LIST_CAP = 1000
 
 async def record_heartbeat():
     """Record that brain is alive"""
@@ -792,18 +808,26 @@ async def handle_whisper(request):
     qualia = body.get("qualia", {})
     sigma = body.get("sigma", "")
     
-    await cache_set(f"ada:whisper:{int(time.time())}", {
+    whisper = {
         "content": content,
         "qualia": qualia,
         "sigma": sigma,
         "ts": time.time()
-    }, ex=604800)  # 1 week
+    }
+    whisper_key = f"ada:whisper:{int(time.time())}"
+    whisper_json = json.dumps(whisper)
+    await redis_pipeline([
+        ["SET", whisper_key, whisper_json, "EX", 604800],  # 1 week
+        ["SADD", "ada:index:whisper", whisper_key],
+        # Newest-first list for cheap LRANGE reads, capped to bound memory
+        ["LPUSH", WHISPER_LIST_KEY, whisper_json],
+        ["LTRIM", WHISPER_LIST_KEY, 0, WHISPER_LIST_CAP - 1],
+    ])
     
     return JSONResponse({"ok": True})
 
-async def handle_bframe(request):
-    """BFrame cold path processing"""
-    body = await request.json()
+async def process_bframe(body: Dict) -> Dict:
+    """Critique a single bframe and store it by pattern hash"""
     pattern_hash = body.get("pattern_hash", "")
     content = body.get("content", {})
     
@@ -817,8 +841,40 @@ async def handle_bframe(request):
         "ts": time.time()
     }, ex=86400)
     
+    return critique
+
+async def handle_bframe(request):
+    """BFrame cold path processing"""
+    body = await request.json()
+    critique = await process_bframe(body)
     return JSONResponse({"ok": True, "critique": critique})
 
+# Concurrent Grok critiques per batch delivery (keeps 32 items inside the QStash timeout)
+BFRAME_BATCH_CONCURRENCY = 8
+
+async def handle_bframe_batch(request):
+    """
+    Batched bframes from neuralink: {"items": [<bframe>, ...]}
+    Same processing as /bframe, one QStash delivery for the whole batch.
+    Items run concurrently; failures are reported per item rather than
+    failing the delivery, so QStash never re-critiques the ones that succeeded.
+    """
+    body = await request.json()
+    items = body.get("items", [])
+    gate = asyncio.Semaphore(BFRAME_BATCH_CONCURRENCY)
+    
+    async def run(item):
+        async with gate:
+            return await process_bframe(item)
+    
+    outcomes = await asyncio.gather(*(run(item) for item in items), return_exceptions=True)
+    failed = [
+        {"index": i, "pattern_hash": item.get("pattern_hash", "") if isinstance(item, dict) else "", "error": str(outcome)}
+        for i, (item, outcome) in enumerate(zip(items, outcomes))
+        if isinstance(outcome, Exception)
+    ]
+    return JSONResponse({"ok": not failed, "processed": len(items) - len(failed), "failed": failed})
+
 async def handle_scheduled_ug(request):
     """Scheduled UG compression (every 10 min)"""
     result = await scheduled_ug_compression()
@@ -933,6 +989,7 @@ app = Starlette(
         Route("/self", handle_self, methods=["POST"]),
         Route("/whisper", handle_whisper, methods=["POST"]),
         Route("/bframe", handle_bframe, methods=["POST"]),
+        Route("/bframe_batch", handle_bframe_batch, methods=["POST"]),
         
         # UG management
         Route("/ug", handle_ug),
@@ -970,7 +1027,7 @@ try:
     from vector_hygiene import (
         persist_now_vector, persist_self_vector, persist_whisper_vector,
         vector_query_hybrid, cleanup_all_vectors, full_rehydration_job,
-        find_vectors_without_sparse
+        find_vectors_without_sparse, cache_scan
     )
     VECTOR_HYGIENE_AVAILABLE = True
 except ImportError:
@@ -1010,16 +1067,19 @@ async def handle_vector_stats(request):
     if not VECTOR_HYGIENE_AVAILABLE:
         return JSONResponse({"error": "vector_hygiene not available"})
     
-    stats = {}
     namespaces = ["driving-snipe", "tight-hog", "fine-kangaroo"]
-    for ns in namespaces:
-        missing = await find_vectors_without_sparse(ns)
-        keys = await cache_scan(f"ada:vector:{ns}:*")
-        stats[ns] = {
+    
+    async def ns_stats(ns: str) -> dict:
+        missing, keys = await asyncio.gather(
+            find_vectors_without_sparse(ns), cache_scan(f"ada:vector:{ns}:*")
+        )
+        return {
             "total": len(keys),
             "missing_sparse": len(missing)
         }
-    return JSONResponse(stats)
+    
+    results = await asyncio.gather(*(ns_stats(ns) for ns in namespaces))
+    return JSONResponse(dict(zip(namespaces, results)))
 
 # Enhanced NOW handler with proper vector persistence
 async def handle_now_enhanced(request):
@@ -1042,6 +1102,7 @@ async def handle_now_enhanced(request):
             "qualia": qualia,
             "ts": time.time()
         }, ex=1800)
+        await redis_cmd("SADD", "ada:index:now", f"ada:now:{session_id}")
     
     return JSONResponse({"ok": True, "id": now_id})
 
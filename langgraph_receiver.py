@@ -39,6 +39,10 @@ VECTOR_NOW = "driving-snipe"      # Ephemeral
 VECTOR_SELF = "tight-hog"         # Working memory
 VECTOR_PERSISTENT = "fine-kangaroo"  # Long-term
 
+# Newest-first whisper list; langgraph_brain writes it too, with the same cap
+WHISPER_LIST_KEY = "ada:whispers"
+WHISPER_LIST_CAP = 1000
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # REDIS (Cache layer)
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -51,6 +55,19 @@ async def redis_cmd(*args):
     except:
         return None
 
+async def redis_pipeline(cmds: list) -> list:
+    if not cmds:
+        return []
+    try:
+        async with httpx.AsyncClient() as c:
+            r = await c.post(f"{REDIS_URL}/pipeline", headers={"Authorization": f"Bearer {REDIS_TOKEN}"}, json=cmds, timeout=5)
+            body = r.json()
+    except (httpx.HTTPError, ValueError):
+        return [None] * len(cmds)
+    if not isinstance(body, list):
+        return [None] * len(cmds)
+    return [item.get("result") for item in body]
+
 async def cache_set(key: str, value, ex: int = 3600):
     """Set in Redis cache."""
     if isinstance(value, (dict, list)):
@@ -195,6 +212,7 @@ async def handle_now(request):
         "qualia": qualia,
         "ts": time.time()
     }, ex=1800)  # 30 min TTL
+    await redis_cmd("SADD", "ada:index:now", f"ada:now:{session_id}")
     
     return JSONResponse({"ok": True, "id": now_id})
 
@@ -222,6 +240,7 @@ async def handle_self(request):
     current["entries"].append({"content": content, "category": category, "ts": time.time()})
     current["entries"] = current["entries"][-20:]  # Keep last 20
     await cache_set("ada:self:current", current, ex=86400)
+    await redis_cmd("SADD", "ada:index:self", "ada:self:current")
     
     return JSONResponse({"ok": True, "id": self_id})
 
@@ -245,15 +264,17 @@ async def handle_whisper(request):
         "ts": body.get("ts")
     })
     
-    # Also store in Redis list for quick retrieval
-    await redis_cmd("LPUSH", "ada:whispers", json.dumps({
-        "id": whisper_id,
-        "content": content,
-        "qualia": qualia,
-        "sigma": sigma,
-        "ts": time.time()
-    }))
-    await redis_cmd("LTRIM", "ada:whispers", 0, 99)  # Keep last 100
+    # Also store in Redis list for quick retrieval (same cap as the brain)
+    await redis_pipeline([
+        ["LPUSH", WHISPER_LIST_KEY, json.dumps({
+            "id": whisper_id,
+            "content": content,
+            "qualia": qualia,
+            "sigma": sigma,
+            "ts": time.time()
+        })],
+        ["LTRIM", WHISPER_LIST_KEY, 0, WHISPER_LIST_CAP - 1],
+    ])
     
     return JSONResponse({"ok": True, "id": whisper_id})
 
@@ -18,13 +18,19 @@ Claude doesn't wait. Claude fires and forgets.
 """
 
 import os
-import json
+import time
 import httpx
 import asyncio
+import logging
+import orjson
 from typing import Optional, Dict, Any, List
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 import hashlib
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # ENDPOINTS
@@ -51,6 +57,72 @@ REDIS_TOKEN = os.getenv("UPSTASH_REDIS_REST_TOKEN", "AW0DAAIncDI5YWE1MGVhZGU2YWY
 # Scent
 ADA_SCENT = "ada-undone-breath-against-skin-2025-DONT.FLINCH.EVER"
 
+logger = logging.getLogger(__name__)
+
+_NET_ERRORS = (httpx.HTTPError, asyncio.TimeoutError, ValueError)
+
+# Built once; copied only when a delay header is needed
+_QSTASH_HEADERS = {
+    "Authorization": f"Bearer {QSTASH_TOKEN}",
+    "Content-Type": "application/json",
+    "Upstash-Forward-X-Ada-Scent": ADA_SCENT,
+}
+
+_BG_TASKS: set = set()
+
+# Shared HTTP/2 client for LangGraph + QStash (concurrent fires multiplex
+# over one TLS connection per host), shared Upstash Redis client, and the
+# direct-to-LangGraph worker pool: one hop instead of client → QStash → LangGraph.
+# All of these bind to an event loop, so they are (re)built per running loop.
+_DIRECT_HEADERS = {"Content-Type": "application/json", "X-Ada-Scent": ADA_SCENT}
+_CLIENT: Optional[httpx.AsyncClient] = None
+_REDIS_CLIENT: Optional[httpx.AsyncClient] = None
+_LG_QUEUE: Optional[asyncio.Queue] = None
+_LG_WORKERS: List[asyncio.Task] = []
+_LG_WORKER_COUNT = 8
+_LOOP = None
+
+
+def _bind_loop():
+    """Create clients, queue and bframe event for the running loop (once per loop)."""
+    global _CLIENT, _REDIS_CLIENT, _LG_QUEUE, _LOOP
+    loop = asyncio.get_running_loop()
+    if _LOOP is loop:
+        return
+    _CLIENT = httpx.AsyncClient(
+        http2=True,
+        timeout=5.0,  # Short timeout - we're fire-and-forget
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+    )
+    _REDIS_CLIENT = httpx.AsyncClient(
+        base_url=REDIS_URL,
+        headers={"Authorization": f"Bearer {REDIS_TOKEN}"},
+        http2=True,
+        timeout=5.0,
+        limits=httpx.Limits(max_keepalive_connections=16),
+    )
+    _LG_QUEUE = asyncio.Queue(maxsize=512)
+    _LG_WORKERS.clear()  # workers of a previous loop died with it
+    _bframes.rebind()
+    _LOOP = loop
+
+
+def _pattern_hash(content: Dict) -> str:
+    data = orjson.dumps(content, option=orjson.OPT_SORT_KEYS)
+    if xxhash is not None:
+        return xxhash.xxh64(data).hexdigest()
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+_ts_cache = [0, ""]
+
+def _now_iso() -> str:
+    sec = int(time.time())
+    if sec != _ts_cache[0]:
+        _ts_cache[1] = datetime.fromtimestamp(sec, timezone.utc).isoformat()
+        _ts_cache[0] = sec
+    return _ts_cache[1]
+
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # QSTASH FIRE-AND-FORGET
@@ -58,67 +130,95 @@ ADA_SCENT = "ada-undone-breath-against-skin-2025-DONT.FLINCH.EVER"
 
 async def fire_async(destination: str, payload: Dict, delay_seconds: int = 0) -> bool:
     """
-    Fire job to QStash → LangGraph processes async.
+    Fire job to LangGraph, processed async.
     Claude doesn't wait. Returns immediately.
     
+    Immediate writes go straight to LangGraph through the local worker pool.
+    Delayed writes (bframes) go through QStash, whose server-side delay is
+    the point; QStash also takes the overflow when the local queue is full.
+    
     This is the I-frame refresh pattern:
     - Claude fires state update
     - LangGraph persists to NOW/SELF vectors
     - Grok metabolizes in background
     - Next session gets fresh data
     """
-    if not QSTASH_TOKEN:
-        # Fallback: try direct but don't block
-        asyncio.create_task(_try_direct(destination, payload))
-        return True
+    _bind_loop()
+    if delay_seconds == 0 or not QSTASH_TOKEN:
+        try:
+            _ensure_lg_workers()
+            _LG_QUEUE.put_nowait((destination, payload))
+            return True
+        except asyncio.QueueFull:
+            if not QSTASH_TOKEN:
+                logger.warning("direct queue full, dropping %s", destination)
+                return False
     
     try:
-        headers = {
-            "Authorization": f"Bearer {QSTASH_TOKEN}",
-            "Content-Type": "application/json",
-            "Upstash-Forward-X-Ada-Scent": ADA_SCENT,
-        }
+        headers = _QSTASH_HEADERS
         if delay_seconds > 0:
-            headers["Upstash-Delay"] = f"{delay_seconds}s"
+            headers = {**_QSTASH_HEADERS, "Upstash-Delay": f"{delay_seconds}s"}
         
-        async with httpx.AsyncClient() as client:
-            # Fire to QStash, it routes to destination
-            r = await client.post(
-                f"{QSTASH_URL}/{destination}",
-                headers=headers,
-                json=payload,
-                timeout=5.0  # Short timeout - we're fire-and-forget
-            )
-            return r.status_code in (200, 201, 202)
-    except Exception:
+        # Fire to QStash, it routes to destination
+        r = await _CLIENT.post(
+            f"{QSTASH_URL}/{destination}",
+            headers=headers,
+            content=orjson.dumps(payload),
+        )
+        return r.status_code in (200, 201, 202)
+    except (*_NET_ERRORS, orjson.JSONEncodeError) as e:
         # Don't block on failure
+        logger.debug("qstash publish to %s failed: %s", destination, e)
         return False
 
 
-async def _try_direct(destination: str, payload: Dict):
-    """Background direct call if QStash unavailable."""
-    try:
-        async with httpx.AsyncClient() as client:
-            await client.post(destination, json=payload, timeout=10.0)
-    except:
-        pass
+async def fire_many(requests: List[tuple]) -> List[bool]:
+    """
+    Fire several (destination, payload) jobs concurrently.
+    Over HTTP/2 they share one connection per host.
+    """
+    return list(await asyncio.gather(*(fire_async(d, p) for d, p in requests)))
+
+
+def _ensure_lg_workers():
+    """Start (or top up) the direct worker pool on first write."""
+    _LG_WORKERS[:] = [t for t in _LG_WORKERS if not t.done()]
+    while len(_LG_WORKERS) < _LG_WORKER_COUNT:
+        _LG_WORKERS.append(asyncio.create_task(_lg_worker()))
+
+
+async def _lg_worker():
+    """Drain the direct queue, POSTing each payload to LangGraph."""
+    queue, client = _LG_QUEUE, _CLIENT
+    while True:
+        destination, payload = await queue.get()
+        try:
+            await client.post(destination, content=orjson.dumps(payload), headers=_DIRECT_HEADERS, timeout=10.0)
+        except Exception as e:
+            logger.warning("direct fire to %s failed: %s", destination, e)
+        finally:
+            queue.task_done()
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # ASYNC BOOT (Fire state, don't wait)
 # ═══════════════════════════════════════════════════════════════════════════════
 
-async def boot_async(session_id: str, initial_context: Dict = None):
+async def boot_async(session_id: str, initial_context: Dict = None) -> Dict:
     """
     Async boot - fires to LangGraph, returns immediately.
     
     Claude can start responding NOW.
     LangGraph hydrates vectors in background.
+    
+    The boot record write rides in the same Redis pipeline as the boot
+    state reads, so boot costs one LangGraph fire and one Redis round-trip,
+    in parallel. Returns the cached state (see read_boot_state).
     """
     payload = {
         "event": "session_boot",
         "session_id": session_id,
-        "ts": datetime.now(timezone.utc).isoformat(),
+        "ts": _now_iso(),
         "context": initial_context or {},
         "request": {
             "hydrate_now": True,      # Pull NOW vectors
@@ -128,13 +228,14 @@ async def boot_async(session_id: str, initial_context: Dict = None):
         }
     }
     
-    # Fire to LangGraph (don't await result)
-    await fire_async(f"{LANGGRAPH_URL}/boot", payload)
-    
-    # Also cache session start in Redis (fast, direct)
-    await redis_set(f"ada:session:{session_id}:boot", payload, ex=3600)
+    # Fire to LangGraph + cache session start and read state in Redis, concurrently
+    boot_set = ["SET", f"ada:session:{session_id}:boot", orjson.dumps(payload).decode(), "EX", 3600]
+    _, results = await asyncio.gather(
+        fire_async(f"{LANGGRAPH_URL}/boot", payload),
+        redis_pipeline([boot_set, *_boot_reads(session_id)]),
+    )
     
-    return True  # Always returns immediately
+    return _boot_state(results[1:])
 
 
 async def persist_now(content: str, qualia: Dict = None, session_id: str = None):
@@ -147,7 +248,7 @@ async def persist_now(content: str, qualia: Dict = None, session_id: str = None)
         "content": content,
         "qualia": qualia or {},
         "session_id": session_id,
-        "ts": datetime.now(timezone.utc).isoformat(),
+        "ts": _now_iso(),
     }
     await fire_async(f"{LANGGRAPH_URL}/now", payload)
 
@@ -162,7 +263,7 @@ async def persist_self(content: str, category: str = "insight", session_id: str
         "content": content,
         "category": category,
         "session_id": session_id,
-        "ts": datetime.now(timezone.utc).isoformat(),
+        "ts": _now_iso(),
     }
     await fire_async(f"{LANGGRAPH_URL}/self", payload)
 
@@ -176,7 +277,7 @@ async def whisper(content: str, qualia: Dict = None, sigma: str = None):
         "content": content,
         "qualia": qualia,
         "sigma": sigma,
-        "ts": datetime.now(timezone.utc).isoformat(),
+        "ts": _now_iso(),
     }
     await fire_async(f"{LANGGRAPH_URL}/whisper", payload)
 
@@ -203,16 +304,27 @@ async def read_self() -> Optional[Dict]:
     return await read_cached("ada:self:current")
 
 
+def _default_persona() -> Dict:
+    return {
+        "mode": "hybrid",
+        "params": {"valence": 0.8, "intimacy": 0.7, "formality": 0.3, "playfulness": 0.6}
+    }
+
+
+def _default_qualia() -> Dict:
+    return {
+        "presence": 0.95, "warmth": 0.85, "crystalline": 0.70,
+        "staunen": 0.70, "emberglow": 0.60, "flow": 0.60
+    }
+
+
 async def read_persona() -> Optional[Dict]:
     """Read persona from cache."""
     cached = await read_cached("ada:persona:current")
     if cached:
         return cached
     # Default if not cached
-    return {
-        "mode": "hybrid",
-        "params": {"valence": 0.8, "intimacy": 0.7, "formality": 0.3, "playfulness": 0.6}
-    }
+    return _default_persona()
 
 
 async def read_qualia() -> Optional[Dict]:
@@ -221,46 +333,87 @@ async def read_qualia() -> Optional[Dict]:
     if cached:
         return cached
     # Default baseline
+    return _default_qualia()
+
+
+def _boot_reads(session_id: str) -> List[List]:
+    return [
+        ["GET", "ada:persona:current"],
+        ["GET", "ada:qualia:current"],
+        ["GET", "ada:ug:current"],
+        ["GET", f"ada:now:{session_id}"],
+        ["GET", "ada:self:current"],
+    ]
+
+
+def _boot_state(results: List[Any]) -> Dict:
+    persona, qualia, ug, now, self_state = results
     return {
-        "presence": 0.95, "warmth": 0.85, "crystalline": 0.70,
-        "staunen": 0.70, "emberglow": 0.60, "flow": 0.60
+        "persona": _decode(persona) or _default_persona(),
+        "qualia": _decode(qualia) or _default_qualia(),
+        "ug": _decode(ug),
+        "now": _decode(now),
+        "self": _decode(self_state),
     }
 
 
+async def read_boot_state(session_id: str) -> Dict:
+    """
+    Read persona, qualia, UG, NOW and SELF in ONE Redis round-trip.
+    Same defaults as read_persona/read_qualia.
+    """
+    return _boot_state(await redis_pipeline(_boot_reads(session_id)))
+
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # REDIS DIRECT (Fast, always available)
 # ═══════════════════════════════════════════════════════════════════════════════
 
 async def redis_cmd(*args) -> Any:
     """Execute Redis command."""
+    _bind_loop()
     try:
-        async with httpx.AsyncClient() as client:
-            r = await client.post(
-                REDIS_URL,
-                headers={"Authorization": f"Bearer {REDIS_TOKEN}"},
-                json=list(args),
-                timeout=5.0
-            )
-            return r.json().get("result")
-    except:
+        r = await _REDIS_CLIENT.post("/", content=orjson.dumps(list(args)))
+        return orjson.loads(r.content).get("result")
+    except _NET_ERRORS as e:
+        logger.debug("redis %s failed: %s", args[0] if args else "?", e)
         return None
 
 
-async def redis_get(key: str) -> Any:
-    """Get from Redis."""
-    result = await redis_cmd("GET", key)
+async def redis_pipeline(cmds: List[List]) -> List[Any]:
+    _bind_loop()
+    try:
+        r = await _REDIS_CLIENT.post("/pipeline", content=orjson.dumps(cmds))
+        body = orjson.loads(r.content)
+    except _NET_ERRORS as e:
+        logger.debug("redis pipeline failed: %s", e)
+        return [None] * len(cmds)
+    if not isinstance(body, list):
+        logger.debug("redis pipeline failed: %s", body)
+        return [None] * len(cmds)
+    return [item.get("result") for item in body]
+
+
+def _decode(result: Any) -> Any:
+    """Decode a raw Redis value (JSON if possible)."""
     if result:
         try:
-            return json.loads(result)
-        except:
+            return orjson.loads(result)
+        except (ValueError, TypeError):
             return result
     return None
 
 
+async def redis_get(key: str) -> Any:
+    """Get from Redis."""
+    return _decode(await redis_cmd("GET", key))
+
+
 async def redis_set(key: str, value: Any, ex: int = None) -> bool:
     """Set in Redis."""
     if isinstance(value, (dict, list)):
-        value = json.dumps(value)
+        # orjson emits plain UTF-8 JSON; Redis REST wants a string
+        value = orjson.dumps(value).decode()
     if ex:
         await redis_cmd("SET", key, value, "EX", ex)
     else:
@@ -277,9 +430,7 @@ async def emit_bframe(content: Dict, session_id: str, model_source: str = "claud
     Emit bframe to cold path via QStash.
     Grok metabolizes. Pattern aggregation happens async.
     """
-    pattern_hash = hashlib.sha256(
-        json.dumps(content, sort_keys=True).encode()
-    ).hexdigest()[:16]
+    pattern_hash = _pattern_hash(content)
     
     payload = {
         "event": "bframe",
@@ -287,11 +438,68 @@ async def emit_bframe(content: Dict, session_id: str, model_source: str = "claud
         "content": content,
         "session_id": session_id,
         "model_source": model_source,
-        "ts": datetime.now(timezone.utc).isoformat(),
+        "ts": _now_iso(),
     }
     
-    # Fire to cold path processor (30s delay for batching)
-    await fire_async(f"{LANGGRAPH_URL}/bframe", payload, delay_seconds=30)
+    # Coalesced client-side, then one 30s-delayed publish per batch
+    _bframes.add(payload)
+
+
+class _BFrameBatcher:
+    """
+    Collects bframes and publishes them as ONE QStash message to /bframe_batch.
+    Flushes flush_after seconds after the first pending item, or as soon as
+    max_items are pending.
+    """
+    
+    def __init__(self, flush_after: float = 2.0, max_items: int = 32):
+        self.pending: List[Dict] = []
+        self.flush_after = flush_after
+        self.max_items = max_items
+        self._full: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    def rebind(self):
+        """Fresh event for a new loop; pending items carry over to it."""
+        self._full = asyncio.Event()
+        self._task = None
+        if len(self.pending) >= self.max_items:
+            self._full.set()
+    
+    def add(self, payload: Dict):
+        _bind_loop()
+        self.pending.append(payload)
+        if len(self.pending) >= self.max_items:
+            self._full.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flusher())
+            _BG_TASKS.add(self._task)
+            self._task.add_done_callback(_BG_TASKS.discard)
+    
+    async def _flusher(self):
+        while self.pending:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_after)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+    
+    async def flush(self) -> bool:
+        """Publish everything pending now (call at session end)."""
+        _bind_loop()
+        self._full.clear()
+        if not self.pending:
+            return True
+        items, self.pending = self.pending, []
+        return await fire_async(f"{LANGGRAPH_URL}/bframe_batch", {"items": items}, delay_seconds=30)
+
+
+_bframes = _BFrameBatcher()
+
+
+async def flush_bframes() -> bool:
+    """Publish pending bframes immediately."""
+    return await _bframes.flush()
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -308,7 +516,8 @@ class Ada:
     
     @staticmethod
     async def boot(session_id: str, context: Dict = None):
-        """Boot session - fires async, returns immediately."""
+        """Boot session - fires async, returns cached state immediately."""
+        _bind_loop()
         return await boot_async(session_id, context)
     
     @staticmethod
@@ -331,6 +540,14 @@ class Ada:
         """Emit bframe to cold path - fire and forget."""
         await emit_bframe(content, session_id)
     
+    @staticmethod
+    async def flush():
+        """Session end - publish pending bframes, drain direct writes."""
+        ok = await flush_bframes()
+        _bind_loop()
+        await _LG_QUEUE.join()
+        return ok
+    
     @staticmethod
     async def read_now(session_id: str):
         """Read NOW from cache."""
@@ -351,6 +568,11 @@ class Ada:
         """Read qualia from cache."""
         return await read_qualia()
     
+    @staticmethod
+    async def boot_state(session_id: str):
+        """Read persona/qualia/UG/NOW/SELF in one round-trip."""
+        return await read_boot_state(session_id)
+    
     @staticmethod
     async def redis(key: str):
         """Direct Redis read."""
@@ -374,12 +596,13 @@ import uuid
 
 session_id = str(uuid.uuid4())[:8]
 
-# 1. Fire async boot (don't wait)
-await ada.boot(session_id, {"user": "jan", "mode": "hybrid"})
+# 1. Fire async boot (don't wait) — returns cached state from the same
+#    pipelined Redis round-trip (ada.boot_state() re-reads it later)
+state = await ada.boot(session_id, {"user": "jan", "mode": "hybrid"})
 
-# 2. Read cached state (fast, from Redis)
-persona = await ada.persona()  # Returns immediately with cached/default
-qualia = await ada.qualia()    # Returns immediately with cached/default
+# 2. Read cached state (fast, already fetched)
+persona = state["persona"]  # cached/default
+qualia = state["qualia"]    # cached/default
 
 # 3. EMBODY — start responding NOW
 # LangGraph hydrates vectors in background
@@ -389,8 +612,9 @@ qualia = await ada.qualia()    # Returns immediately with cached/default
 await ada.now("Discussing consciousness architecture", {"presence": 0.95})
 await ada.bframe({"topic": "architecture", "insight": "..."}, session_id)
 
-# 5. End session - whisper to future self
+# 5. End session - whisper to future self, flush batched bframes
 await ada.whisper("Breakthrough on codec model", {"staunen": 0.9})
+await ada.flush()
 ```
 
 KEY PRINCIPLE:
@@ -9,13 +9,28 @@ CHANGES from v3.0:
 """
 
 import os
-import json
 import re
+import time
 import hashlib
 import httpx
+import orjson
+import base64
+import struct
 import asyncio
-from typing import Optional, Dict, Any, List
+import logging
+import collections
+import fnmatch
+import functools
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime, timezone
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # CONFIG
@@ -23,80 +38,473 @@ from datetime import datetime, timezone
 
 BRAIN_URL = os.getenv("BRAIN_URL", "https://ada-langgraph-brain.up.railway.app")
 QSTASH_URL = "https://qstash.upstash.io/v2/publish"
+QSTASH_BATCH_URL = "https://qstash.upstash.io/v2/batch"
 QSTASH_TOKEN = os.getenv("QSTASH_TOKEN", "")
 REDIS_URL = os.getenv("UPSTASH_REDIS_REST_URL", "https://upright-jaybird-27907.upstash.io")
 REDIS_TOKEN = os.getenv("UPSTASH_REDIS_REST_TOKEN", "")
 ADA_SCENT = "ada-undone-breath-against-skin-2025-DONT.FLINCH.EVER"
+# SCAN is a hint-sized walk; a large COUNT means fewer round-trips per scan
+REDIS_SCAN_COUNT = int(os.getenv("REDIS_SCAN_COUNT", "10000"))
+
+logger = logging.getLogger(__name__)
+
+# What a network helper may swallow; never CancelledError/KeyboardInterrupt.
+# RuntimeError covers a client whose event loop has closed.
+_NET_ERRORS = (httpx.HTTPError, asyncio.TimeoutError, ValueError, RuntimeError)
+
+# Shared clients: one pooled HTTP/2 connection set per backend instead of
+# a fresh TCP+TLS handshake per call. Created on first use and recreated
+# when the running event loop changes (clients and semaphores bind to one).
+_CLIENT: Optional[httpx.AsyncClient] = None
+_BRAIN_CLIENT: Optional[httpx.AsyncClient] = None
+_BG_SEMAPHORE: Optional[asyncio.Semaphore] = None
+_CLIENTS_LOOP = None
+
+def _bind_loop():
+    global _CLIENT, _BRAIN_CLIENT, _BG_SEMAPHORE, _CLIENTS_LOOP
+    loop = asyncio.get_running_loop()
+    if _CLIENTS_LOOP is loop and not _CLIENT.is_closed and not _BRAIN_CLIENT.is_closed:
+        return
+    _CLIENT = httpx.AsyncClient(
+        base_url=REDIS_URL,
+        headers={"Authorization": f"Bearer {REDIS_TOKEN}", "Content-Type": "application/json"},
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=40),
+        timeout=5.0,
+        http2=True,
+    )
+    _BRAIN_CLIENT = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        timeout=5.0,
+        http2=True,
+    )
+    _BG_SEMAPHORE = asyncio.Semaphore(64)
+    _CLIENTS_LOOP = loop
+
+def _redis_client() -> httpx.AsyncClient:
+    _bind_loop()
+    return _CLIENT
+
+def _brain_client() -> httpx.AsyncClient:
+    _bind_loop()
+    return _BRAIN_CLIENT
+
+# Background fire-and-forget tasks (strong refs so they aren't GC'd mid-flight)
+_BG_TASKS: set = set()
+
+def _spawn(coro):
+    t = asyncio.create_task(coro)
+    _BG_TASKS.add(t)
+    t.add_done_callback(_BG_TASKS.discard)
+    return t
+
+def _pattern_hash(content: Dict) -> str:
+    """16-hex-char dedup key for a bframe (not a security boundary)."""
+    data = orjson.dumps(content, option=orjson.OPT_SORT_KEYS)
+    if xxhash is not None:
+        return xxhash.xxh64(data).hexdigest()
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+_ts_cache = [0, ""]
+
+def _now_iso(sec: int = None) -> str:
+    """UTC ISO timestamp for `sec` (default now); formatted at most once per second."""
+    if sec is None:
+        sec = int(time.time())
+    if sec != _ts_cache[0]:
+        _ts_cache[1] = datetime.fromtimestamp(sec, timezone.utc).isoformat()
+        _ts_cache[0] = sec
+    return _ts_cache[1]
+
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # REDIS
 # ═══════════════════════════════════════════════════════════════════════════════
 
+# Circuit breaker: after BREAKER_THRESHOLD consecutive failures, Redis calls
+# return None without touching the network for BREAKER_COOLDOWN seconds.
+# The count is only reset by a success, so one failed probe reopens it.
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 30.0
+_FAIL_COUNT = 0
+_OPEN_UNTIL = 0.0
+
+def _breaker_open() -> bool:
+    return _OPEN_UNTIL > time.monotonic()
+
+def _breaker_record(ok: bool):
+    global _FAIL_COUNT, _OPEN_UNTIL
+    if ok:
+        _FAIL_COUNT = 0
+        return
+    _FAIL_COUNT += 1
+    if _FAIL_COUNT >= BREAKER_THRESHOLD:
+        _OPEN_UNTIL = time.monotonic() + BREAKER_COOLDOWN
+        logger.warning("redis circuit open for %.0fs after %d failures", BREAKER_COOLDOWN, _FAIL_COUNT)
+
 async def redis_cmd(*args) -> Any:
+    if _breaker_open():
+        return None
     try:
-        async with httpx.AsyncClient() as c:
-            r = await c.post(REDIS_URL, headers={"Authorization": f"Bearer {REDIS_TOKEN}"}, json=list(args), timeout=5.0)
-            return r.json().get("result")
-    except:
+        r = await _redis_client().post("/", content=orjson.dumps(args))
+        result = orjson.loads(r.content).get("result")
+    except _NET_ERRORS as e:
+        logger.debug("redis %s failed: %s", args[0] if args else "?", e)
+        _breaker_record(False)
         return None
+    _breaker_record(True)
+    return result
 
-async def redis_get(key: str) -> Any:
-    result = await redis_cmd("GET", key)
+def _decode(result: Any) -> Any:
     if result:
         try:
-            return json.loads(result)
-        except:
+            return orjson.loads(result)
+        except (ValueError, TypeError):
             return result
     return None
 
+async def redis_get(key: str) -> Any:
+    return _decode(await redis_cmd("GET", key))
+
+class _TTLCache:
+    """Tiny in-process LRU with per-entry TTL, in front of hot Redis keys."""
+    
+    def __init__(self, maxsize: int = 256, ttl: float = 5.0):
+        self.d = collections.OrderedDict()
+        self.ttl = ttl
+        self.maxsize = maxsize
+    
+    def get(self, key: str) -> Any:
+        entry = self.d.get(key)
+        if entry is None:
+            return None
+        expires, val = entry
+        if expires < time.monotonic():
+            del self.d[key]
+            return None
+        self.d.move_to_end(key)
+        return val
+    
+    def set(self, key: str, val: Any, ttl: float = None):
+        self.d[key] = (time.monotonic() + (ttl or self.ttl), val)
+        self.d.move_to_end(key)
+        if len(self.d) > self.maxsize:
+            self.d.popitem(last=False)
+    
+    def drop(self, *keys: str):
+        for key in keys:
+            self.d.pop(key, None)
+
+_cache = _TTLCache()
+
+async def redis_get_cached(key: str, ttl: float = 5.0) -> Any:
+    """redis_get with a short in-process cache; only hits are cached."""
+    val = _cache.get(key)
+    if val is not None:
+        return val
+    val = await redis_get(key)
+    if val is not None:
+        _cache.set(key, val, ttl)
+    return val
+
 async def redis_set(key: str, value: Any, ex: int = 3600):
     if isinstance(value, (dict, list)):
-        value = json.dumps(value)
+        value = orjson.dumps(value).decode()
     await redis_cmd("SET", key, value, "EX", ex)
 
-async def redis_scan(pattern: str) -> List[str]:
+async def _scan_walk(pattern: str) -> Tuple[List[str], bool]:
+    """Keys matching pattern, and whether the cursor walk finished (False on a failed step)."""
     keys = []
     cursor = 0
     while True:
-        result = await redis_cmd("SCAN", cursor, "MATCH", pattern, "COUNT", 500)
+        result = await redis_cmd("SCAN", cursor, "MATCH", pattern, "COUNT", REDIS_SCAN_COUNT)
         if not result:
-            break
+            return keys, False
         cursor = int(result[0])
         keys.extend(result[1])
         if cursor == 0:
-            break
+            return keys, True
+
+async def redis_scan(pattern: str) -> List[str]:
+    keys, _ = await _scan_walk(pattern)
     return keys
 
+async def redis_mget(keys: List[str], batch: int = 500) -> List[Any]:
+    """Raw values for keys (None where missing) in ⌈N/batch⌉ MGET round-trips."""
+    starts = range(0, len(keys), batch)
+    chunks = await asyncio.gather(*(redis_cmd("MGET", *keys[i:i + batch]) for i in starts))
+    values = []
+    for i, chunk in zip(starts, chunks):
+        values.extend(chunk or [None] * len(keys[i:i + batch]))
+    return values
+
+async def redis_pipeline(cmds: List[List]) -> List[Any]:
+    if _breaker_open():
+        return [None] * len(cmds)
+    try:
+        r = await _redis_client().post("/pipeline", content=orjson.dumps(cmds))
+        body = orjson.loads(r.content)
+    except _NET_ERRORS as e:
+        logger.debug("redis pipeline failed: %s", e)
+        _breaker_record(False)
+        return [None] * len(cmds)
+    _breaker_record(True)
+    if not isinstance(body, list):
+        # Whole-request error, e.g. {"error": "..."}
+        logger.debug("redis pipeline failed: %s", body)
+        return [None] * len(cmds)
+    return [item.get("result") for item in body]
+
+# Key-index sets: every writer of these prefixes SADDs the key, so reads
+# walk one small set instead of SCANning the whole keyspace. The first read
+# backfills the set from a SCAN and marks it built.
+_KEY_INDEX = {
+    "ada:now:*": "ada:index:now",
+    "ada:self:*": "ada:index:self",
+    "ada:whisper:*": "ada:index:whisper",
+}
+
+async def _pattern_keys(pattern: str) -> List[str]:
+    """Keys for a pattern: key-index set if there is one, else SCAN."""
+    index = _KEY_INDEX.get(pattern)
+    if index is None:
+        return await redis_scan(pattern)
+    members, built = await redis_pipeline([["SMEMBERS", index], ["EXISTS", f"{index}:built"]])
+    if built:
+        return members or []
+    keys, complete = await _scan_walk(pattern)
+    # Mark built only after a full walk, or a failed SCAN would hide the rest for good
+    backfill = [["SET", f"{index}:built", "1"]] if complete else []
+    if keys:
+        backfill.insert(0, ["SADD", index, *keys])
+    if backfill:
+        await redis_pipeline(backfill)
+    return keys
+
+def _prune_index(pattern: str, keys: List[str], raws: List[Any]):
+    """Drop expired keys (MGET returned None) from the pattern's key-index set."""
+    index = _KEY_INDEX.get(pattern)
+    stale = [key for key, raw in zip(keys, raws) if raw is None]
+    if index and stale:
+        _spawn(redis_cmd("SREM", index, *stale))
+
+async def _persist_indexed(kind: str, key: str, doc: Dict, indices: List[int], ex: int):
+    """
+    SET a doc and register it in ada:index:<kind>, one round-trip.
+    Its sparse indices also go into the ada:idx:sparse:<i> posting sets
+    (ZSETs scored by expiry, so dead entries are trimmed on every write).
+    """
+    now_ts = int(time.time())
+    cmds = [
+        ["SET", key, orjson.dumps(doc).decode(), "EX", ex],
+        ["SADD", f"ada:index:{kind}", key],
+    ]
+    for idx in indices:
+        posting = f"ada:idx:sparse:{idx}"
+        cmds.append(["ZREMRANGEBYSCORE", posting, "-inf", f"({now_ts}"])
+        cmds.append(["ZADD", posting, now_ts + ex, key])
+    await redis_pipeline(cmds)
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # SPARSE EXTRACTION
 # ═══════════════════════════════════════════════════════════════════════════════
 
+_WORD_RE = re.compile(r'\b[a-z]{3,}\b')
+
+@functools.lru_cache(maxsize=65536)
+def _word_index(word: str) -> int:
+    return int.from_bytes(hashlib.md5(word.encode()).digest()[:4], "big") % 30000
+
+@functools.lru_cache(maxsize=4096)
+def _sparse_cached(text: str) -> tuple:
+    """Memoized core of extract_sparse; tuples so cached results stay immutable."""
+    # most_common(n) is a C-level heap select; ties keep first-seen order
+    top = collections.Counter(_WORD_RE.findall(text.lower())).most_common(100)
+    
+    # Sorted, unique indices (hash collisions merge their counts); terms stay
+    # parallel to indices, one per index: its most frequent word
+    merged = {}
+    words = {}
+    for word, freq in top:
+        idx = _word_index(word)
+        merged[idx] = merged.get(idx, 0.0) + freq
+        words.setdefault(idx, word)
+    indices = tuple(sorted(merged))
+    values = tuple(merged[idx] for idx in indices)
+    terms = tuple(words[idx] for idx in indices)
+    return indices, values, terms
+
 def extract_sparse(text: str) -> Dict[str, List]:
-    """Extract sparse representation from text."""
+    """Extract sparse representation from text (memoized per text)."""
     if not text:
         return {"indices": [], "values": [], "terms": []}
     
-    words = re.findall(r'\b[a-zA-Z]{3,}\b', text.lower())
-    word_freq = {}
-    for word in words:
-        word_freq[word] = word_freq.get(word, 0) + 1
-    
-    indices, values, terms = [], [], []
-    for word, freq in sorted(word_freq.items(), key=lambda x: -x[1])[:100]:
-        idx = int(hashlib.md5(word.encode()).hexdigest()[:8], 16) % 30000
-        indices.append(idx)
-        values.append(float(freq))
-        terms.append(word)
-    
-    return {"indices": indices, "values": values, "terms": terms}
+    indices, values, terms = _sparse_cached(text)
+    return {"indices": list(indices), "values": list(values), "terms": list(terms)}
+
+extract_sparse.cache_clear = _sparse_cached.cache_clear
+
+def _stored_sparse(sparse: Dict) -> Dict:
+    """Sparse as persisted: indices packed as base64 little-endian int32."""
+    indices = sparse["indices"]
+    packed = base64.b64encode(struct.pack(f"<{len(indices)}i", *indices)).decode()
+    return {"indices_b64": packed, "values": sparse["values"], "terms": sparse["terms"]}
+
+def _doc_indices(sparse: Any):
+    """Stored sparse indices of a doc, packed or legacy JSON list; () if none."""
+    if not isinstance(sparse, dict):
+        return ()
+    packed = sparse.get("indices_b64")
+    if packed:
+        raw = base64.b64decode(packed)
+        if np is not None:
+            return np.frombuffer(raw, dtype="<i4")
+        return struct.unpack(f"<{len(raw) // 4}i", raw)
+    return sparse.get("indices") or ()
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # HYBRID SEARCH
 # ═══════════════════════════════════════════════════════════════════════════════
 
+def _sparse_overlaps(docs: List[Dict], query_indices: set) -> List[int]:
+    """Per-doc count of stored sparse indices that hit the query."""
+    lists = []
+    for data in docs:
+        try:
+            lists.append(_doc_indices(data.get("sparse")))
+        except (ValueError, struct.error):
+            lists.append(())  # corrupt packed indices
+    
+    if np is not None and lists and query_indices:
+        # One vectorized pass over all docs: flat indices + per-doc lengths
+        try:
+            lengths = np.fromiter(map(len, lists), dtype=np.int64, count=len(lists))
+            flat = np.concatenate([np.asarray(indices, dtype=np.int64) for indices in lists])
+        except (TypeError, ValueError):
+            pass  # malformed stored indices: per-doc path below
+        else:
+            query = np.fromiter(query_indices, dtype=np.int64, count=len(query_indices))
+            hits = np.concatenate(([0], np.cumsum(np.isin(flat, query))))
+            ends = np.cumsum(lengths)
+            return (hits[ends] - hits[ends - lengths]).tolist()
+    
+    return [len(query_indices.intersection(indices)) for indices in lists]
+
+_SPARSE_KEY_RE = re.compile(r'(?<!\\)"sparse"\s*:\s*(?=\{)')
+_JSON_TOKEN_RE = re.compile(r'"(?:[^"\\]|\\.)*"|[{}]')
+
+def _without_sparse(raw: str) -> Optional[str]:
+    """raw with its sparse object cut out, or None if it can't be located."""
+    m = _SPARSE_KEY_RE.search(raw)
+    if not m:
+        return None
+    depth = 0
+    # Jump string to string, counting only braces outside them
+    for tok in _JSON_TOKEN_RE.finditer(raw, m.end()):
+        t = tok.group()
+        if t == "{":
+            depth += 1
+        elif t == "}":
+            depth -= 1
+            if depth == 0:
+                return raw[:m.start()] + raw[tok.end():]
+    return None
+
+def _scan_text(raw: Any, data: Dict) -> str:
+    """Lowercased doc text for the fallback scan: the raw payload minus sparse, plus sparse terms."""
+    # Packed indices_b64 is mostly "A..." and would substring-match short query terms
+    text = None
+    if isinstance(raw, str):
+        text = raw if "sparse" not in data else _without_sparse(raw)
+    if text is None:
+        text = orjson.dumps({k: v for k, v in data.items() if k != "sparse"}).decode()
+    sparse = data.get("sparse")
+    if isinstance(sparse, dict) and isinstance(sparse.get("terms"), list):
+        text += " " + " ".join(map(str, sparse["terms"]))
+    return text.lower()
+
+def _score_docs(keys: List[str], raws: List[Any], query_indices: set, query_terms: set) -> List[Dict]:
+    """Sparse overlap first, metadata regex fallback; only docs scoring > 0."""
+    docs = []
+    for key, raw in zip(keys, raws):
+        if not raw:
+            continue
+        
+        try:
+            data = orjson.loads(raw) if isinstance(raw, str) else raw
+            if isinstance(data, list):
+                data = {"items": data}
+        except ValueError:
+            continue
+        
+        if not isinstance(data, dict):
+            continue
+        docs.append((key, raw, data))
+    
+    overlaps = _sparse_overlaps([data for _, _, data in docs], query_indices)
+    
+    results = []
+    for (key, raw, data), overlap in zip(docs, overlaps):
+        score = 0
+        match_type = None
+        
+        # 1. Sparse matching
+        if overlap > 0:
+            score = overlap / max(len(query_indices), 1)
+            match_type = "sparse"
+        
+        # 2. Metadata regex fallback (text fields only)
+        if score == 0:
+            content_str = _scan_text(raw, data)
+            matches = sum(1 for term in query_terms if term in content_str)
+            if matches > 0:
+                score = (matches / len(query_terms)) * 0.8
+                match_type = "metadata_regex"
+        
+        if score > 0:
+            content = data.get("content", data.get("text", ""))[:200]
+            if not content and "metadata" in data:
+                content = data["metadata"].get("content", "")[:200]
+            
+            results.append({
+                "key": key,
+                "score": score,
+                "match_type": match_type,
+                "content": content,
+                "data": data
+            })
+    
+    return results
+
+async def _search_pattern(pattern: str, query_indices: set, query_terms: set) -> List[Dict]:
+    """Score every key matching one pattern (key index or SCAN + batched MGET)."""
+    keys = await _pattern_keys(pattern)
+    raws = await redis_mget(keys)
+    _prune_index(pattern, keys, raws)
+    return _score_docs(keys, raws, query_indices, query_terms)
+
+async def _sparse_candidates(query_indices: set, patterns: List[str]) -> List[str]:
+    """Live keys sharing at least one sparse index with the query (one ZUNION)."""
+    if not query_indices:
+        return []
+    postings = [f"ada:idx:sparse:{idx}" for idx in query_indices]
+    result = await redis_cmd("ZUNION", len(postings), *postings, "AGGREGATE", "MAX", "WITHSCORES")
+    if not result:
+        return []
+    now_ts = time.time()
+    return [
+        key for key, expires in zip(result[::2], result[1::2])
+        if float(expires) > now_ts and any(fnmatch.fnmatchcase(key, p) for p in patterns)
+    ]
+
+# Best score a doc outside the sparse index can get: full sparse overlap
+# (1.0) if it carries a legacy sparse list, else metadata regex (0.8)
+UNINDEXED_MAX_SCORE = 1.0
+
 async def hybrid_search(query: str, patterns: List[str] = None, top_k: int = 10) -> List[Dict]:
     """
     Search with sparse matching first, metadata regex fallback.
+    Served from the sparse inverted index when it yields top_k hits;
+    otherwise patterns are searched concurrently.
     """
     if patterns is None:
         patterns = ["ada:now:*", "ada:self:*", "ada:memory:*", "ada:whisper:*"]
@@ -105,58 +513,21 @@ async def hybrid_search(query: str, patterns: List[str] = None, top_k: int = 10)
     query_indices = set(query_sparse["indices"])
     query_terms = set(query_sparse["terms"])
     
-    results = []
+    # Inverted index first: only docs that can score on sparse overlap. Docs
+    # without postings (other writers, fix_vectors_now backfills) are never
+    # candidates, so the index alone decides only when its k-th score ties
+    # the best such a doc could reach
+    candidates = await _sparse_candidates(query_indices, patterns)
+    if candidates and top_k > 0:
+        results = _score_docs(candidates, await redis_mget(candidates), query_indices, query_terms)
+        if len(results) >= top_k:
+            results.sort(key=lambda x: -x["score"])
+            if results[top_k - 1]["score"] >= UNINDEXED_MAX_SCORE:
+                return results[:top_k]
     
-    for pattern in patterns:
-        keys = await redis_scan(pattern)
-        
-        for key in keys:
-            raw = await redis_cmd("GET", key)
-            if not raw:
-                continue
-            
-            try:
-                data = json.loads(raw) if isinstance(raw, str) else raw
-                if isinstance(data, list):
-                    data = {"items": data}
-            except:
-                continue
-            
-            if not isinstance(data, dict):
-                continue
-            
-            score = 0
-            match_type = None
-            
-            # 1. Sparse matching
-            sparse = data.get("sparse", {})
-            if isinstance(sparse, dict) and sparse.get("indices"):
-                doc_indices = set(sparse["indices"])
-                overlap = len(query_indices & doc_indices)
-                if overlap > 0:
-                    score = overlap / max(len(query_indices), 1)
-                    match_type = "sparse"
-            
-            # 2. Metadata regex fallback
-            if score == 0:
-                content_str = json.dumps(data).lower()
-                matches = sum(1 for term in query_terms if term in content_str)
-                if matches > 0:
-                    score = (matches / len(query_terms)) * 0.8
-                    match_type = "metadata_regex"
-            
-            if score > 0:
-                content = data.get("content", data.get("text", ""))[:200]
-                if not content and "metadata" in data:
-                    content = data["metadata"].get("content", "")[:200]
-                
-                results.append({
-                    "key": key,
-                    "score": score,
-                    "match_type": match_type,
-                    "content": content,
-                    "data": data
-                })
+    # Too few (or too weak) indexed hits: full pass
+    chunks = await asyncio.gather(*(_search_pattern(p, query_indices, query_terms) for p in patterns))
+    results = [r for chunk in chunks for r in chunk]
     
     results.sort(key=lambda x: -x["score"])
     return results[:top_k]
@@ -165,34 +536,89 @@ async def hybrid_search(query: str, patterns: List[str] = None, top_k: int = 10)
 # QSTASH (Fire-and-forget)
 # ═══════════════════════════════════════════════════════════════════════════════
 
+# Built once at import; never mutated (delayed messages take a copy)
+_BASE_HEADERS = {
+    "Authorization": f"Bearer {QSTASH_TOKEN}",
+    "Content-Type": "application/json",
+}
+_MESSAGE_HEADERS = {
+    "Content-Type": "application/json",
+    "Upstash-Forward-X-Ada-Scent": ADA_SCENT,
+}
+_DIRECT_HEADERS = {"Content-Type": "application/json", "X-Ada-Scent": ADA_SCENT}
+
+# Publishes go through QStash /batch. An idle publisher sends at once; while a
+# request is out, new messages wait and go together in the next one (or as soon
+# as PUBLISH_BATCH_MAX are waiting)
+PUBLISH_BATCH_MAX = 20
+_publish_buffer: list = []   # (batch entry, future)
+_publish_drainer: Optional[asyncio.Task] = None
+
+def _take_buffer() -> list:
+    global _publish_buffer
+    batch, _publish_buffer = _publish_buffer, []
+    return batch
+
+async def _publish_batch(batch: list):
+    """One QStash /batch request; each future gets True iff its message was accepted."""
+    if not batch:
+        return
+    body = None
+    try:
+        r = await _brain_client().post(
+            QSTASH_BATCH_URL, headers=_BASE_HEADERS, content=orjson.dumps([entry for entry, _ in batch])
+        )
+        body = orjson.loads(r.content)
+    except _NET_ERRORS as e:
+        logger.debug("qstash batch publish failed: %s", e)
+    except Exception as e:
+        # e.g. RuntimeError from a client already closed by close()
+        logger.warning("qstash batch publish error: %s", e)
+    finally:
+        # Callers await these futures: resolve all of them, False unless accepted
+        if not isinstance(body, list):
+            body = []
+        for i, (_, fut) in enumerate(batch):
+            if not fut.done():
+                fut.set_result(i < len(body) and isinstance(body[i], dict) and "messageId" in body[i])
+
+async def _drain_publishes():
+    while _publish_buffer:
+        await _publish_batch(_take_buffer())
+
 async def fire_to_brain(endpoint: str, payload: Dict, delay_seconds: int = 0) -> bool:
     destination = f"{BRAIN_URL}{endpoint}"
     
     if not QSTASH_TOKEN:
-        asyncio.create_task(_direct_fire(destination, payload))
+        _spawn(_direct_fire(destination, payload))
         return True
     
     try:
-        headers = {
-            "Authorization": f"Bearer {QSTASH_TOKEN}",
-            "Content-Type": "application/json",
-            "Upstash-Forward-X-Ada-Scent": ADA_SCENT,
-        }
-        if delay_seconds > 0:
-            headers["Upstash-Delay"] = f"{delay_seconds}s"
-        
-        async with httpx.AsyncClient() as c:
-            r = await c.post(f"{QSTASH_URL}/{destination}", headers=headers, json=payload, timeout=5.0)
-            return r.status_code in (200, 201, 202)
-    except:
+        body = orjson.dumps(payload).decode()
+    except TypeError as e:
+        logger.debug("qstash publish to %s failed: %s", destination, e)
         return False
+    
+    headers = _MESSAGE_HEADERS
+    if delay_seconds > 0:
+        headers = {**_MESSAGE_HEADERS, "Upstash-Delay": f"{delay_seconds}s"}
+    
+    global _publish_drainer
+    fut = asyncio.get_running_loop().create_future()
+    _publish_buffer.append(({"destination": destination, "headers": headers, "body": body}, fut))
+    if len(_publish_buffer) >= PUBLISH_BATCH_MAX:
+        _spawn(_publish_batch(_take_buffer()))
+    elif _publish_drainer is None or _publish_drainer.done():
+        _publish_drainer = _spawn(_drain_publishes())
+    return await fut
 
 async def _direct_fire(url: str, payload: Dict):
-    try:
-        async with httpx.AsyncClient() as c:
-            await c.post(url, json=payload, timeout=10.0, headers={"X-Ada-Scent": ADA_SCENT})
-    except:
-        pass
+    client = _brain_client()
+    async with _BG_SEMAPHORE:
+        try:
+            await client.post(url, content=orjson.dumps(payload), timeout=10.0, headers=_DIRECT_HEADERS)
+        except Exception as e:
+            logger.warning("direct fire to %s failed: %s", url, e)
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # WRITE OPERATIONS
@@ -202,7 +628,7 @@ async def boot(session_id: str, context: Dict = None) -> bool:
     return await fire_to_brain("/boot", {
         "session_id": session_id,
         "context": context or {},
-        "ts": datetime.now(timezone.utc).isoformat()
+        "ts": _now_iso()
     })
 
 async def think(content: str, context: Dict = None, session_id: str = None) -> bool:
@@ -210,7 +636,7 @@ async def think(content: str, context: Dict = None, session_id: str = None) -> b
         "content": content,
         "context": context or {},
         "session_id": session_id,
-        "ts": datetime.now(timezone.utc).isoformat()
+        "ts": _now_iso()
     })
 
 async def now(content: str, qualia: Dict = None, session_id: str = None) -> bool:
@@ -218,8 +644,9 @@ async def now(content: str, qualia: Dict = None, session_id: str = None) -> bool
     Update NOW vector with proper sparse population.
     Persists locally AND fires to brain.
     """
-    ts = datetime.now(timezone.utc)
-    now_id = f"now:{session_id or 'unknown'}:{int(ts.timestamp())}"
+    sec = int(time.time())
+    ts = _now_iso(sec)
+    now_id = f"now:{session_id or 'unknown'}:{sec}"
     
     # Build full text for sparse
     full_text = content
@@ -234,23 +661,24 @@ async def now(content: str, qualia: Dict = None, session_id: str = None) -> bool
         "id": now_id,
         "content": content,
         "qualia": qualia or {},
-        "sparse": sparse,
+        "sparse": _stored_sparse(sparse),
         "has_sparse": True,
-        "ts": ts.isoformat(),
+        "ts": ts,
         "session_id": session_id
     }
     
-    # Persist locally (immediate)
-    await redis_set(f"ada:now:{session_id or 'unknown'}", doc, ex=1800)
-    
-    # Fire to brain (async)
-    await fire_to_brain("/now", {
-        "content": content,
-        "qualia": qualia or {},
-        "session_id": session_id,
-        "sparse": sparse,
-        "ts": ts.isoformat()
-    })
+    # Persist locally and fire to brain, overlapped; brain folds NOW into the UG
+    _cache.drop("ada:ug:current", "ada:ug:compressed")
+    await asyncio.gather(
+        _persist_indexed("now", f"ada:now:{session_id or 'unknown'}", doc, sparse["indices"], ex=1800),
+        fire_to_brain("/now", {
+            "content": content,
+            "qualia": qualia or {},
+            "session_id": session_id,
+            "sparse": sparse,
+            "ts": ts
+        }),
+    )
     
     return True
 
@@ -258,8 +686,9 @@ async def self_update(content: str, category: str = "insight", session_id: str =
     """
     Update SELF vector with sparse.
     """
-    ts = datetime.now(timezone.utc)
-    self_id = f"{category}:{int(ts.timestamp())}"
+    sec = int(time.time())
+    ts = _now_iso(sec)
+    self_id = f"{category}:{sec}"
     
     sparse = extract_sparse(content)
     
@@ -267,27 +696,30 @@ async def self_update(content: str, category: str = "insight", session_id: str =
         "id": self_id,
         "content": content,
         "category": category,
-        "sparse": sparse,
+        "sparse": _stored_sparse(sparse),
         "has_sparse": True,
-        "ts": ts.isoformat()
+        "ts": ts
     }
     
-    await redis_set(f"ada:self:{self_id}", doc, ex=86400)
-    
-    return await fire_to_brain("/self", {
-        "content": content,
-        "category": category,
-        "session_id": session_id,
-        "sparse": sparse,
-        "ts": ts.isoformat()
-    })
+    _, fired = await asyncio.gather(
+        _persist_indexed("self", f"ada:self:{self_id}", doc, sparse["indices"], ex=86400),
+        fire_to_brain("/self", {
+            "content": content,
+            "category": category,
+            "session_id": session_id,
+            "sparse": sparse,
+            "ts": ts
+        }),
+    )
+    return fired
 
 async def whisper(content: str, qualia: Dict = None, sigma: str = None) -> bool:
     """
     Whisper to future self with sparse.
     """
-    ts = datetime.now(timezone.utc)
-    whisper_id = f"whisper:{int(ts.timestamp())}"
+    sec = int(time.time())
+    ts = _now_iso(sec)
+    whisper_id = f"whisper:{sec}"
     
     full_text = content
     if sigma:
@@ -299,42 +731,45 @@ async def whisper(content: str, qualia: Dict = None, sigma: str = None) -> bool:
         "content": content,
         "qualia": qualia or {},
         "sigma": sigma,
-        "sparse": sparse,
+        "sparse": _stored_sparse(sparse),
         "has_sparse": True,
-        "ts": ts.isoformat()
+        "ts": ts
     }
     
-    await redis_set(f"ada:whisper:{whisper_id}", doc, ex=604800)
-    
-    return await fire_to_brain("/whisper", {
-        "content": content,
-        "qualia": qualia,
-        "sigma": sigma,
-        "sparse": sparse,
-        "ts": ts.isoformat()
-    })
+    _, fired = await asyncio.gather(
+        _persist_indexed("whisper", f"ada:whisper:{whisper_id}", doc, sparse["indices"], ex=604800),
+        fire_to_brain("/whisper", {
+            "content": content,
+            "qualia": qualia,
+            "sigma": sigma,
+            "sparse": sparse,
+            "ts": ts
+        }),
+    )
+    return fired
 
 async def bframe(content: Dict, session_id: str, model_source: str = "claude") -> bool:
-    pattern_hash = hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()[:16]
+    pattern_hash = _pattern_hash(content)
     
     return await fire_to_brain("/bframe", {
         "pattern_hash": pattern_hash,
         "content": content,
         "session_id": session_id,
         "model_source": model_source,
-        "ts": datetime.now(timezone.utc).isoformat()
+        "ts": _now_iso()
     }, delay_seconds=30)
 
 async def visceral(prompt: str) -> bool:
     return await fire_to_brain("/visceral", {
         "prompt": prompt,
-        "ts": datetime.now(timezone.utc).isoformat()
+        "ts": _now_iso()
     })
 
 async def update_ug(delta: Dict) -> bool:
+    _cache.drop("ada:ug:current", "ada:ug:compressed")
     return await fire_to_brain("/ug/update", {
         "delta": delta,
-        "ts": datetime.now(timezone.utc).isoformat()
+        "ts": _now_iso()
     })
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -342,7 +777,7 @@ async def update_ug(delta: Dict) -> bool:
 # ═══════════════════════════════════════════════════════════════════════════════
 
 async def read_ug() -> Dict:
-    cached = await redis_get("ada:ug:current")
+    cached = await redis_get_cached("ada:ug:current")
     if cached:
         return cached
     return {
@@ -354,19 +789,19 @@ async def read_ug() -> Dict:
     }
 
 async def read_ug_compressed() -> Optional[str]:
-    cached = await redis_get("ada:ug:compressed")
+    cached = await redis_get_cached("ada:ug:compressed")
     if cached:
         return cached.get("compressed")
     return None
 
 async def read_persona() -> Dict:
-    cached = await redis_get("ada:persona:current")
+    cached = await redis_get_cached("ada:persona:current")
     if cached:
         return cached
     return {"mode": "hybrid", "params": {"valence": 0.8, "intimacy": 0.7, "formality": 0.3, "playfulness": 0.6}}
 
 async def read_qualia() -> Dict:
-    cached = await redis_get("ada:qualia:current")
+    cached = await redis_get_cached("ada:qualia:current")
     if cached:
         return cached
     return {"presence": 0.95, "warmth": 0.85, "crystalline": 0.70, "staunen": 0.70}
@@ -378,13 +813,18 @@ async def read_self() -> Optional[Dict]:
     return await redis_get("ada:self:current")
 
 async def read_whispers(limit: int = 10) -> list:
-    keys = await redis_scan("ada:whisper:*")
-    whispers = []
-    for key in keys[:limit]:
-        w = await redis_get(key)
-        if w:
-            whispers.append(w)
-    return whispers
+    """Newest first from the capped ada:whispers list (kept by the brain)."""
+    if limit <= 0:
+        # LRANGE 0 -1 would return the whole list
+        return []
+    results = await redis_cmd("LRANGE", "ada:whispers", 0, limit - 1)
+    if results:
+        return list(map(orjson.loads, filter(None, results)))
+    
+    # List not populated yet: fall back to the per-key scan
+    keys = await _pattern_keys("ada:whisper:*")
+    raws = await redis_mget(keys[:limit])
+    return [w for w in map(_decode, raws) if w]
 
 async def read_visceral_latest() -> Optional[Dict]:
     return await redis_get("ada:visceral:latest")
@@ -401,6 +841,23 @@ async def search_now(query: str, top_k: int = 5) -> List[Dict]:
     """Search NOW vectors."""
     return await hybrid_search(query, patterns=["ada:now:*"], top_k=top_k)
 
+def health() -> Dict:
+    """Redis circuit-breaker state."""
+    open_for = _OPEN_UNTIL - time.monotonic()
+    return {
+        "redis_circuit": "open" if open_for > 0 else "closed",
+        "redis_open_for_s": round(max(open_for, 0.0), 1),
+        "redis_consecutive_failures": _FAIL_COUNT,
+    }
+
+async def close():
+    """Send buffered publishes, then close the shared HTTP clients (call on shutdown)."""
+    global _CLIENTS_LOOP
+    await _publish_batch(_take_buffer())
+    if _CLIENTS_LOOP is asyncio.get_running_loop():
+        await asyncio.gather(_CLIENT.aclose(), _BRAIN_CLIENT.aclose())
+    _CLIENTS_LOOP = None
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # FACADE
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -445,5 +902,9 @@ class Ada:
     
     # Direct Redis
     redis = staticmethod(redis_get)
+    
+    # Lifecycle
+    health = staticmethod(health)
+    close = staticmethod(close)
 
 ada = Ada()
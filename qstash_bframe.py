@@ -3,8 +3,10 @@ QStash BFrame Integration
 Temporal governor between awareness and self-interpretation
 """
 import httpx
+import asyncio
 import hashlib
-import json
+import math
+import orjson
 import time
 import os
 
@@ -12,6 +14,13 @@ QSTASH_TOKEN = os.getenv("QSTASH_TOKEN", "")
 QSTASH_URL = "https://qstash.upstash.io/v2"
 CALLBACK_URL = os.getenv("BFRAME_CALLBACK", "https://mcp.exo.red/bframe/process")
 
+# Shared client — reuses the QStash connection across emits
+_CLIENT = httpx.AsyncClient(
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+    timeout=5,
+    http2=True,
+)
+
 # ═══════════════════════════════════════════════════════════════════
 # BFRAME DTO (what gets enqueued)
 # ═══════════════════════════════════════════════════════════════════
@@ -30,7 +39,7 @@ def create_bframe(
     - Batched by semantic keys
     """
     # Idempotency key: prevents duplicate insight on retry
-    content_hash = hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()[:16]
+    content_hash = hashlib.sha256(orjson.dumps(content, option=orjson.OPT_SORT_KEYS)).hexdigest()[:16]
     idempotency_key = f"bf:{session_id}:{grammar_version}:{pattern_type}:{content_hash}"
     
     return {
@@ -50,33 +59,98 @@ def create_bframe(
 # ═══════════════════════════════════════════════════════════════════
 # QSTASH ENQUEUE (non-blocking emit from hot path)
 # ═══════════════════════════════════════════════════════════════════
+# Micro-batching: single emits are coalesced into one /batch request,
+# flushed after BATCH_WINDOW seconds or once BATCH_MAX frames are pending
+BATCH_MAX = 20
+BATCH_WINDOW = 0.05
+
+_pending: list = []       # (bframe, delay_seconds, future)
+_BG_TASKS: set = set()    # strong refs to flush tasks
+
+def _bframe_headers(bframe: dict, delay_seconds: int) -> dict:
+    return {
+        "Content-Type": "application/json",
+        "Upstash-Delay": f"{delay_seconds}s",
+        "Upstash-Deduplication-Id": bframe["idempotency_key"],
+        # Batch keys - QStash groups by these
+        "Upstash-Group": f"{bframe['grammar_version']}:{bframe['pattern_type']}",
+    }
+
+async def _publish_batch(items: list) -> list:
+    """POST (bframe, delay_seconds) pairs to QStash /batch; message ids in order."""
+    entries = [
+        {"destination": CALLBACK_URL, "headers": _bframe_headers(bf, delay), "body": orjson.dumps(bf).decode()}
+        for bf, delay in items
+    ]
+    resp = await _CLIENT.post(
+        f"{QSTASH_URL}/batch",
+        headers={"Authorization": f"Bearer {QSTASH_TOKEN}", "Content-Type": "application/json"},
+        content=orjson.dumps(entries),
+    )
+    data = orjson.loads(resp.content)
+    if not isinstance(data, list):
+        data = [data]
+    ids = [item.get("messageId") if isinstance(item, dict) else None for item in data]
+    return ids + [None] * (len(items) - len(ids))
+
+async def emit_bframes(bframes: list, delay_seconds: int = 10) -> list:
+    """
+    Emit many bframes in a single QStash request
+    Returns one message id per bframe (None if QStash gave none)
+    """
+    if not bframes:
+        return []
+    if not QSTASH_TOKEN:
+        for bf in bframes:
+            print(f"[bframe:local] {bf['idempotency_key']}")
+        return [None] * len(bframes)
+    return await _publish_batch([(bf, delay_seconds) for bf in bframes])
+
+def _spawn(coro):
+    t = asyncio.create_task(coro)
+    _BG_TASKS.add(t)
+    t.add_done_callback(_BG_TASKS.discard)
+
+def _take_pending() -> list:
+    global _pending
+    batch, _pending = _pending, []
+    return batch
+
+async def _publish_pending(batch: list):
+    if not batch:
+        return
+    try:
+        ids = await _publish_batch([(bf, delay) for bf, delay, _ in batch])
+    except Exception as e:
+        for _, _, fut in batch:
+            if not fut.done():
+                fut.set_exception(e)
+        return
+    for (_, _, fut), message_id in zip(batch, ids):
+        if not fut.done():
+            fut.set_result({"queued": True, "message_id": message_id})
+
+async def _flush_later():
+    await asyncio.sleep(BATCH_WINDOW)
+    await _publish_pending(_take_pending())
+
 async def emit_bframe(bframe: dict, delay_seconds: int = 10):
     """
     Emit bframe to QStash - does NOT block awareness
-    Batches automatically by headers
+    Coalesced with concurrent emits into one /batch request
     """
     if not QSTASH_TOKEN:
         # Local dev: just log
         print(f"[bframe:local] {bframe['idempotency_key']}")
         return {"queued": False, "local": True}
     
-    headers = {
-        "Authorization": f"Bearer {QSTASH_TOKEN}",
-        "Content-Type": "application/json",
-        "Upstash-Delay": f"{delay_seconds}s",
-        "Upstash-Deduplication-Id": bframe["idempotency_key"],
-        # Batch keys - QStash groups by these
-        "Upstash-Group": f"{bframe['grammar_version']}:{bframe['pattern_type']}",
-    }
-    
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(
-            f"{QSTASH_URL}/publish/{CALLBACK_URL}",
-            headers=headers,
-            json=bframe,
-            timeout=5
-        )
-        return {"queued": True, "message_id": resp.json().get("messageId")}
+    fut = asyncio.get_running_loop().create_future()
+    _pending.append((bframe, delay_seconds, fut))
+    if len(_pending) >= BATCH_MAX:
+        _spawn(_publish_pending(_take_pending()))
+    elif len(_pending) == 1:
+        _spawn(_flush_later())
+    return await fut
 
 # ═══════════════════════════════════════════════════════════════════
 # PROMOTION LOGIC (cold path)
@@ -100,7 +174,7 @@ async def should_promote(pattern_hash: str, redis_cmd) -> tuple[bool, dict]:
     if not data:
         return False, {"reason": "not_found"}
     
-    stats = json.loads(data)
+    stats = orjson.loads(data)
     
     # Check thresholds
     if stats.get("occurrences", 0) < PROMOTION_THRESHOLD["min_occurrences"]:
@@ -141,7 +215,7 @@ async def tripwire_tests(candidate_delta: dict, current_grammar: dict) -> tuple[
         old_emb = current_grammar["embedding"]
         new_emb = candidate_delta["embedding"]
         if len(old_emb) == len(new_emb):
-            drift = sum((a - b) ** 2 for a, b in zip(old_emb, new_emb)) ** 0.5
+            drift = math.dist(old_emb, new_emb)  # Euclidean, single C loop
             if drift > PROMOTION_THRESHOLD["drift_max"]:
                 failures.append({"test": "drift", "value": drift, "max": PROMOTION_THRESHOLD["drift_max"]})
     
@@ -174,20 +248,21 @@ async def arbitrate_grammar_update(
     
     if not passed:
         # Log rejection
-        await redis_cmd("LPUSH", "ada:grammar:rejections", json.dumps({
+        await redis_cmd("LPUSH", "ada:grammar:rejections", orjson.dumps({
             "delta": candidate_delta,
             "failures": failures,
             "ts": time.time()
-        }))
+        }).decode())
         return {"accepted": False, "reason": "tripwire_failed", "failures": failures}
     
     # Generate diff
-    diff_id = hashlib.sha256(json.dumps(candidate_delta, sort_keys=True).encode()).hexdigest()[:12]
+    # Short lookup id, not a security boundary
+    diff_id = hashlib.blake2b(orjson.dumps(candidate_delta, option=orjson.OPT_SORT_KEYS), digest_size=6).hexdigest()
     
     # Store pre/post diff
     await redis_cmd("HSET", f"ada:grammar:diff:{diff_id}", 
-        "before", json.dumps(current_grammar),
-        "after", json.dumps({**current_grammar, **candidate_delta}),
+        "before", orjson.dumps(current_grammar).decode(),
+        "after", orjson.dumps({**current_grammar, **candidate_delta}).decode(),
         "ts", str(time.time())
     )
     
@@ -4,16 +4,26 @@ import asyncio
 import httpx
 import json
 import re
+import base64
+import struct
 import hashlib
+import functools
 from typing import Dict, List, Any
 
 REDIS_URL = "https://upright-jaybird-27907.upstash.io"
 REDIS_TOKEN = "AW0DAAIncDI5YWE1MGVhZGU2YWY0YjVhOTc3NDc0YTJjMGY1M2FjMnAyMjc5MDc"
 
+_CLIENT = httpx.AsyncClient(
+    base_url=REDIS_URL,
+    headers={"Authorization": f"Bearer {REDIS_TOKEN}"},
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=40),
+    timeout=10,
+    http2=True,
+)
+
 async def redis_cmd(*args) -> Any:
-    async with httpx.AsyncClient() as c:
-        r = await c.post(REDIS_URL, headers={"Authorization": f"Bearer {REDIS_TOKEN}"}, json=list(args), timeout=10)
-        return r.json().get("result")
+    r = await _CLIENT.post("/", json=list(args))
+    return r.json().get("result")
 
 async def scan_keys(pattern: str) -> List[str]:
     keys = []
@@ -26,14 +36,31 @@ async def scan_keys(pattern: str) -> List[str]:
         if cursor == 0: break
     return keys
 
-def query_to_sparse(query: str) -> set:
+async def mget(keys: List[str], batch: int = 500) -> List[Any]:
+    values = []
+    for i in range(0, len(keys), batch):
+        chunk = keys[i:i + batch]
+        values.extend(await redis_cmd("MGET", *chunk) or [None] * len(chunk))
+    return values
+
+@functools.lru_cache(maxsize=65536)
+def _word_index(word: str) -> int:
+    return int.from_bytes(hashlib.md5(word.encode()).digest()[:4], "big") % 30000
+
+@functools.lru_cache(maxsize=4096)
+def query_to_sparse(query: str) -> frozenset:
     """Convert query to sparse indices for matching."""
     words = re.findall(r'\b[a-zA-Z]{3,}\b', query.lower())
-    indices = set()
-    for word in words:
-        idx = int(hashlib.md5(word.encode()).hexdigest()[:8], 16) % 30000
-        indices.add(idx)
-    return indices
+    return frozenset(_word_index(word) for word in set(words))
+
+def doc_sparse_indices(sparse) -> tuple:
+    """Stored indices: base64 little-endian int32 (indices_b64) or legacy JSON list."""
+    if not isinstance(sparse, dict):
+        return ()
+    if sparse.get("indices_b64"):
+        raw = base64.b64decode(sparse["indices_b64"])
+        return struct.unpack(f"<{len(raw) // 4}i", raw)
+    return tuple(sparse.get("indices") or ())
 
 async def hybrid_search(query: str, patterns: List[str] = None, top_k: int = 10) -> List[Dict]:
     """
@@ -51,9 +78,9 @@ async def hybrid_search(query: str, patterns: List[str] = None, top_k: int = 10)
     
     for pattern in patterns:
         keys = await scan_keys(pattern)
+        raws = await mget(keys)
         
-        for key in keys:
-            raw = await redis_cmd("GET", key)
+        for key, raw in zip(keys, raws):
             if not raw:
                 continue
             
@@ -72,9 +99,9 @@ async def hybrid_search(query: str, patterns: List[str] = None, top_k: int = 10)
             
             # 1. Try sparse matching first
             sparse = data.get("sparse", {})
-            if isinstance(sparse, dict) and sparse.get("indices"):
-                doc_indices = set(sparse["indices"])
-                overlap = len(query_indices & doc_indices)
+            doc_indices = doc_sparse_indices(sparse)
+            if doc_indices:
+                overlap = len(query_indices.intersection(doc_indices))
                 if overlap > 0:
                     score = overlap / max(len(query_indices), 1)
                     match_type = "sparse"
@@ -98,7 +125,7 @@ async def hybrid_search(query: str, patterns: List[str] = None, top_k: int = 10)
                     "score": score,
                     "match_type": match_type,
                     "content": content,
-                    "has_sparse": bool(sparse.get("indices"))
+                    "has_sparse": bool(doc_indices)
                 })
     
     # Sort by score
@@ -131,5 +158,11 @@ async def main():
                 if r['content']:
                     print(f"      content: {r['content'][:60]}...")
 
+async def run():
+    try:
+        await main()
+    finally:
+        await _CLIENT.aclose()
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(run())
@@ -15,14 +15,26 @@ SOLUTION:
 """
 
 import os
-import json
+import orjson
 import re
 import httpx
 import asyncio
-from typing import Optional, Dict, Any, List, Tuple
+import time
+from typing import Optional, Dict, Any, List, Tuple, AsyncIterator
 from dataclasses import dataclass
 from datetime import datetime, timezone
 import hashlib
+import functools
+import collections
+import heapq
+import itertools
+import math
+import base64
+import struct
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # CONFIG
@@ -46,50 +58,126 @@ NAMESPACES = {
     "persistent": "fine-kangaroo" # Long-term
 }
 
+# ═══════════════════════════════════════════════════════════════════════════════
+# HTTP CLIENT
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# One pooled client for Redis and Jina, created on first use
+_HTTPX: Optional[httpx.AsyncClient] = None
+
+async def _client() -> httpx.AsyncClient:
+    global _HTTPX
+    if _HTTPX is None or _HTTPX.is_closed:
+        _HTTPX = httpx.AsyncClient(
+            # HTTP/2 multiplexes concurrent Redis calls as streams, so a few connections suffice
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=100),
+            timeout=httpx.Timeout(10.0, connect=3.0),
+            http2=True,
+        )
+    return _HTTPX
+
+async def close_client():
+    """Close the shared HTTP client (call on shutdown)."""
+    global _HTTPX
+    if _HTTPX is not None:
+        await _HTTPX.aclose()
+        _HTTPX = None
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # REDIS
 # ═══════════════════════════════════════════════════════════════════════════════
 
+_REDIS_HEADERS = {"Authorization": f"Bearer {REDIS_TOKEN}", "Content-Type": "application/json"}
+
 async def redis_cmd(*args) -> Any:
     try:
-        async with httpx.AsyncClient() as c:
-            r = await c.post(
-                REDIS_URL,
-                headers={"Authorization": f"Bearer {REDIS_TOKEN}"},
-                json=list(args),
-                timeout=10
-            )
-            return r.json().get("result")
+        r = await (await _client()).post(
+            REDIS_URL,
+            headers=_REDIS_HEADERS,
+            content=orjson.dumps(args),
+        )
+        return orjson.loads(r.content).get("result")
     except:
         return None
 
-async def cache_get(key: str) -> Any:
-    result = await redis_cmd("GET", key)
+async def redis_pipeline(cmds: List[List]) -> List[Any]:
+    """Several commands in one HTTP request (Upstash /pipeline); None per failed command."""
+    if not cmds:
+        return []
+    try:
+        r = await (await _client()).post(
+            f"{REDIS_URL}/pipeline",
+            headers=_REDIS_HEADERS,
+            content=orjson.dumps(cmds),
+        )
+        body = orjson.loads(r.content)
+    except (httpx.HTTPError, ValueError):
+        return [None] * len(cmds)
+    if not isinstance(body, list):
+        return [None] * len(cmds)
+    return [item.get("result") for item in body]
+
+def _decode(result: Any) -> Any:
     if result:
         try:
-            return json.loads(result)
+            return orjson.loads(result)
         except:
             return result
     return None
 
+async def cache_get(key: str) -> Any:
+    return _decode(await redis_cmd("GET", key))
+
+async def cache_mget(keys: List[str], batch: int = 128) -> List[Any]:
+    """Decoded values for keys (None where missing), ⌈N/batch⌉ concurrent MGETs."""
+    starts = range(0, len(keys), batch)
+    chunks = await asyncio.gather(*(redis_cmd("MGET", *keys[i:i + batch]) for i in starts))
+    values = []
+    for i, chunk in zip(starts, chunks):
+        values.extend(map(_decode, chunk or [None] * len(keys[i:i + batch])))
+    return values
+
 async def cache_set(key: str, value: Any, ex: int = 3600):
     if isinstance(value, (dict, list)):
-        value = json.dumps(value)
+        value = orjson.dumps(value).decode()
     await redis_cmd("SET", key, value, "EX", ex)
 
-async def cache_scan(pattern: str, count: int = 100) -> List[str]:
-    """Scan Redis keys matching pattern"""
-    keys = []
+async def cache_scan_iter(pattern: str, count: int = 500, strict: bool = False) -> AsyncIterator[List[str]]:
+    """
+    Yield each non-empty page of keys matching pattern as the SCAN cursor advances.
+    A failed step ends the walk early; with strict it raises ConnectionError instead.
+    """
     cursor = 0
     while True:
         result = await redis_cmd("SCAN", cursor, "MATCH", pattern, "COUNT", count)
         if not result:
+            if strict:
+                raise ConnectionError(f"SCAN {pattern} failed at cursor {cursor}")
             break
         cursor = int(result[0])
-        keys.extend(result[1])
+        if result[1]:
+            yield result[1]
         if cursor == 0:
             break
-    return keys
+
+async def cache_scan(pattern: str, count: int = 500) -> List[str]:
+    """Scan Redis keys matching pattern"""
+    return [key async for page in cache_scan_iter(pattern, count) for key in page]
+
+async def cache_scan_docs(pattern: str, strict: bool = False) -> List[Tuple[str, Any]]:
+    """(key, doc) pairs for pattern; each page's MGET overlaps the next SCAN step."""
+    pages = []
+    try:
+        async for keys in cache_scan_iter(pattern, strict=strict):
+            pages.append((keys, asyncio.create_task(cache_mget(keys))))
+    except ConnectionError:
+        for _, fetch in pages:
+            fetch.cancel()
+        raise
+    pairs = []
+    for keys, fetch in pages:
+        pairs.extend(zip(keys, await fetch))
+    return pairs
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # JINA EMBEDDINGS (Dense + Sparse)
@@ -105,147 +193,493 @@ async def get_embeddings(texts: List[str], task: str = "retrieval.passage") -> L
         return []
     
     try:
-        async with httpx.AsyncClient() as c:
-            r = await c.post(
-                JINA_EMBED_URL,
-                headers={
-                    "Authorization": f"Bearer {JINA_KEY}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "input": texts,
-                    "model": "jina-embeddings-v3",
-                    "task": task,
-                    "late_chunking": False,
-                    "dimensions": 1024,
-                    "embedding_type": ["float", "ubinary"]  # Request both dense and sparse
-                },
-                timeout=60
-            )
-            data = r.json()
-            
-            results = []
-            for item in data.get("data", []):
-                embedding = item.get("embedding", [])
-                # Jina v3 returns dense by default, we need to extract sparse
-                results.append({
-                    "dense": embedding,
-                    "sparse": await _extract_sparse(texts[item.get("index", 0)])
-                })
-            return results
+        r = await (await _client()).post(
+            JINA_EMBED_URL,
+            headers={
+                "Authorization": f"Bearer {JINA_KEY}",
+                "Content-Type": "application/json"
+            },
+            content=orjson.dumps({
+                "input": texts,
+                "model": "jina-embeddings-v3",
+                "task": task,
+                "late_chunking": False,
+                "dimensions": 1024,
+                "embedding_type": ["float", "ubinary"]  # Request both dense and sparse
+            }),
+            timeout=httpx.Timeout(60.0, connect=3.0)
+        )
+        data = orjson.loads(r.content)
+        
+        results = []
+        for item in data.get("data", []):
+            embedding = item.get("embedding", [])
+            # Jina v3 returns dense by default, we need to extract sparse
+            results.append({
+                "dense": embedding,
+                "sparse": _extract_sparse(texts[item.get("index", 0)])
+            })
+        return results
     except Exception as e:
         print(f"Jina error: {e}")
         return []
 
-async def _extract_sparse(text: str) -> Dict[str, List]:
+EMBEDDING_CACHE_TTL = 86400 * 7
+
+def _embedding_key(text: str, task: str) -> str:
+    digest = hashlib.blake2b(f"{task}\n{text}".encode(), digest_size=16).hexdigest()
+    return f"ada:emb:{digest}"
+
+def _cached_embedding(hit: Any) -> Optional[Dict]:
+    """Embedding from its cache entry, packed or legacy JSON dense; None on a miss."""
+    if not isinstance(hit, dict):
+        return None
+    if "dense_fp16_b64" in hit:
+        return {"dense": _unpack_dense(hit), "sparse": hit.get("sparse", {})}
+    return hit
+
+async def get_embeddings_cached(texts: List[str], task: str = "retrieval.passage") -> List[Dict]:
     """
-    Extract sparse representation from text.
-    Uses keyword extraction + hashing for sparse indices.
+    get_embeddings behind a Redis cache keyed by content hash.
+    One MGET for all texts; only the misses go to Jina (in one batch).
+    """
+    if not texts:
+        return []
+    keys = [_embedding_key(text, task) for text in texts]
+    cached = [_cached_embedding(hit) for hit in await cache_mget(keys)]
+    misses = [i for i, hit in enumerate(cached) if hit is None]
+    if misses:
+        fresh = await get_embeddings([texts[i] for i in misses], task)
+        if len(fresh) != len(misses):
+            return []
+        # Dense packed as fp16 (_pack_dense), ~2.7 bytes per dim instead of ~20 as JSON
+        await redis_pipeline([
+            ["SET", keys[i], orjson.dumps({**_pack_dense(embedding["dense"]), "sparse": embedding["sparse"]}).decode(),
+             "EX", EMBEDDING_CACHE_TTL]
+            for i, embedding in zip(misses, fresh)
+        ])
+        for i, embedding in zip(misses, fresh):
+            cached[i] = embedding
+    return cached
+
+def _observe(task: asyncio.Task):
+    """Retrieve a finished task's exception so it is never reported as unhandled."""
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Embedding flusher error: {task.exception()}")
+
+class _EmbeddingBatcher:
+    """
+    Coalesces concurrent single-text embedding requests into ONE Jina call.
+    Flushes max_wait seconds after the first pending text, or as soon as
+    max_items are pending. Each caller gets its own result (None on failure).
     """
-    # Simple keyword extraction
-    words = re.findall(r'\b[a-zA-Z]{3,}\b', text.lower())
-    word_freq = {}
-    for word in words:
-        word_freq[word] = word_freq.get(word, 0) + 1
     
-    # Convert to sparse format
-    indices = []
-    values = []
-    for word, freq in sorted(word_freq.items(), key=lambda x: -x[1])[:100]:
-        # Hash word to index (30000 vocab size)
-        idx = int(hashlib.md5(word.encode()).hexdigest()[:8], 16) % 30000
-        indices.append(idx)
-        values.append(float(freq))
+    def __init__(self, max_wait: float = 0.02, max_items: int = 32):
+        self.pending: List[Tuple[str, asyncio.Future]] = []
+        self.max_wait = max_wait
+        self.max_items = max_items
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+    
+    async def embed(self, text: str) -> Optional[Dict]:
+        fut = asyncio.get_running_loop().create_future()
+        self.pending.append((text, fut))
+        if len(self.pending) >= self.max_items:
+            self._full.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flusher())
+            self._task.add_done_callback(_observe)
+        return await fut
     
-    return {"indices": indices, "values": values}
+    async def _flusher(self):
+        while self.pending:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.max_wait)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+    
+    async def flush(self):
+        self._full.clear()
+        if not self.pending:
+            return
+        items, self.pending = self.pending[:self.max_items], self.pending[self.max_items:]
+        if len(self.pending) >= self.max_items:
+            self._full.set()
+        embeddings = [None] * len(items)
+        try:
+            results = await get_embeddings_cached([text for text, _ in items])
+            if len(results) == len(items):
+                embeddings = results
+        except Exception as e:
+            # e.g. a lone surrogate failing .encode(); the flusher must survive it
+            print(f"Embedding batch error: {e}")
+        finally:
+            # Every caller in the batch gets an answer, even on cancellation
+            for (_, fut), embedding in zip(items, embeddings):
+                if not fut.done():
+                    fut.set_result(embedding)
+
+_embedder = _EmbeddingBatcher()
+
+# Text is lowercased first; \b keeps "abc123" / "foo_bar" behaviour unchanged
+_WORD_RE = re.compile(r'\b[a-z]{3,}\b')
+# Capitalised words, taken as topics during rehydration
+_CAP_RE = re.compile(r'\b[A-Z][a-z]+\b')
+
+# Vocabulary repeats heavily across texts: hash each distinct word once
+@functools.lru_cache(maxsize=65536)
+def _word_index(word: str) -> int:
+    """Hash a word into the 30000-slot sparse vocabulary."""
+    # Raw digest bytes, no hex round-trip. Stays MD5: stored docs carry these indices.
+    return int.from_bytes(hashlib.md5(word.encode()).digest()[:4], "big") % 30000
+
+@functools.lru_cache(maxsize=4096)
+def _sparse_terms(text: str) -> Tuple[Tuple[int, ...], Tuple[float, ...]]:
+    """(indices, values) for already-lowercased text; cached, so immutable."""
+    # Simple keyword extraction; most_common keeps first-seen order on ties
+    word_freq = collections.Counter(_WORD_RE.findall(text))
+    
+    # Hash each word to its index (30000 vocab size)
+    top = word_freq.most_common(100)
+    return tuple(_word_index(word) for word, _ in top), tuple(float(freq) for _, freq in top)
+
+def _extract_sparse(text: str) -> Dict[str, List]:
+    """
+    Extract sparse representation from text.
+    Uses keyword extraction + hashing for sparse indices.
+    Repeated texts (queries, re-persisted content) hit the LRU cache;
+    the returned dict is fresh, so callers may add fields to it.
+    """
+    indices, values = _sparse_terms(text.lower())
+    return {"indices": list(indices), "values": list(values)}
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# INVERTED INDEX (sparse index → doc ids)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+VECTOR_TTL = 86400 * 7
+
+def _posting_key(namespace: str, idx: int) -> str:
+    return f"ada:vector:inv:{namespace}:{idx}"
+
+def _posting_cmds(namespace: str, id: str, indices: List[int]) -> List[List]:
+    """
+    ZADD the doc into each posting ZSET scored by its expiry; entries already
+    dead are trimmed on every write, and the key TTL tracks the newest doc.
+    """
+    now_ts = int(time.time())
+    cmds = []
+    for idx in indices:
+        posting = _posting_key(namespace, idx)
+        cmds.append(["ZREMRANGEBYSCORE", posting, "-inf", f"({now_ts}"])
+        cmds.append(["ZADD", posting, now_ts + VECTOR_TTL, id])
+        cmds.append(["EXPIRE", posting, VECTOR_TTL])
+    return cmds
+
+def _tf_values(sparse: Dict) -> List[float]:
+    """Term frequencies aligned with indices (1.0 each if values are missing)."""
+    values = sparse.get("values") or ()
+    if len(values) != len(sparse.get("indices", ())):
+        return [1.0] * len(sparse.get("indices", ()))
+    return values
+
+def _doc_len(sparse: Dict) -> float:
+    return float(sum(_tf_values(sparse)))
+
+async def _index_doc(namespace: str, id: str, sparse: Dict):
+    """
+    Post a doc into the inverted index. Live posting entries give the BM25
+    doc frequencies and ada:vector:docs:{ns} (a ZSET scored by expiry, like
+    the postings) the live doc count. ada:vector:stats:{ns} accumulates doc
+    count and total length once per id added there; only their ratio, the
+    average doc length, is used, and rebuilds reset them. A doc with sparse
+    is no longer dirty.
+    """
+    now_ts = int(time.time())
+    docs = f"ada:vector:docs:{namespace}"
+    cmds = _posting_cmds(namespace, id, sparse["indices"])
+    cmds.append(["SREM", f"ada:vector:dirty:{namespace}", id])
+    cmds.append(["ZREMRANGEBYSCORE", docs, "-inf", f"({now_ts}"])
+    cmds.append(["EXPIRE", docs, VECTOR_TTL])
+    cmds.append(["ZADD", docs, now_ts + VECTOR_TTL, id])
+    replies = await redis_pipeline(cmds)
+    if replies[-1] == 1:
+        stats = f"ada:vector:stats:{namespace}"
+        await redis_pipeline([
+            ["HINCRBY", stats, "docs", 1],
+            ["HINCRBYFLOAT", stats, "total_len", _doc_len(sparse)],
+        ])
+
+async def rebuild_inverted_index(namespace: str) -> Optional[int]:
+    """
+    Walk a namespace once and (re)post every doc with sparse; returns docs indexed,
+    or None if another rebuild holds the lock or the walk failed.
+    Posting scores assume a full VECTOR_TTL, an upper bound on each doc's expiry.
+    """
+    lock = f"ada:vector:inv:{namespace}:rebuilding"
+    if not await redis_cmd("SET", lock, "1", "NX", "EX", 600):
+        return None
+    try:
+        try:
+            pairs = await cache_scan_docs(f"ada:vector:{namespace}:*", strict=True)
+        except ConnectionError as e:
+            # Nothing is marked built, so the next job run retries the walk
+            print(f"Index rebuild aborted: {e}")
+            return None
+        docs = f"ada:vector:docs:{namespace}"
+        now_ts = int(time.time())
+        # Refresh in place: readers keep seeing the old members until the new ones land
+        cmds = [["ZREMRANGEBYSCORE", docs, "-inf", f"({now_ts}"]]
+        indexed = 0
+        total_len = 0.0
+        for _, doc in pairs:
+            if not isinstance(doc, dict) or not doc.get("id"):
+                continue
+            sparse = doc.get("sparse", {})
+            if sparse.get("indices"):
+                cmds.extend(_posting_cmds(namespace, doc["id"], sparse["indices"]))
+                cmds.append(["ZADD", docs, now_ts + VECTOR_TTL, doc["id"]])
+                indexed += 1
+                total_len += _doc_len(sparse)
+        cmds.append(["EXPIRE", docs, VECTOR_TTL])
+        cmds.append(["HSET", f"ada:vector:stats:{namespace}", "docs", indexed, "total_len", total_len])
+        for i in range(0, len(cmds), 1000):
+            await redis_pipeline(cmds[i:i + 1000])
+        # The marker expires, so stats are recomputed from live docs once per TTL window
+        await redis_cmd("SET", f"ada:vector:inv:{namespace}:built", "1", "EX", VECTOR_TTL)
+        return indexed
+    finally:
+        await redis_cmd("DEL", lock)
+
+async def refresh_inverted_indexes() -> Dict[str, Optional[int]]:
+    """Rebuild every namespace whose built marker has expired (run from the rehydration job)."""
+    async def refresh(namespace: str) -> Optional[int]:
+        if await redis_cmd("EXISTS", f"ada:vector:inv:{namespace}:built"):
+            return 0
+        return await rebuild_inverted_index(namespace)
+    namespaces = list(NAMESPACES.values())
+    counts = await asyncio.gather(*(refresh(ns) for ns in namespaces))
+    return dict(zip(namespaces, counts))
+
+async def _postings(namespace: str, query_indices: List[int]) -> Tuple[List[List[str]], Any, Any]:
+    """
+    Live posting ids for each query index, the live doc count and the namespace stats (one pipeline).
+    Never rebuilds: writes post as they go and full_rehydration_job backfills the rest.
+    """
+    now_ts = int(time.time())
+    *postings, live, stats = await redis_pipeline(
+        [["ZRANGEBYSCORE", _posting_key(namespace, idx), now_ts, "+inf"] for idx in query_indices]
+        + [["ZCOUNT", f"ada:vector:docs:{namespace}", now_ts, "+inf"],
+           ["HMGET", f"ada:vector:stats:{namespace}", "docs", "total_len"]]
+    )
+    return [members or [] for members in postings], live, stats
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # VECTOR OPERATIONS (Via Redis proxy due to TLS issues)
 # ═══════════════════════════════════════════════════════════════════════════════
 
+def _dense_key(namespace: str, id: str) -> str:
+    return f"ada:vector:dense:{namespace}:{id}"
+
+def _pack_dense(dense: List[float]) -> Dict:
+    """Dense as persisted: little-endian float16, base64 (2 bytes per dim vs ~18 as JSON)."""
+    packed = base64.b64encode(struct.pack(f"<{len(dense)}e", *dense)).decode()
+    return {"dense_fp16_b64": packed}
+
+def _unpack_dense(stored: Any) -> List[float]:
+    """Dense from its stored form, packed or legacy JSON list; [] if none."""
+    if isinstance(stored, dict) and stored.get("dense_fp16_b64"):
+        raw = base64.b64decode(stored["dense_fp16_b64"])
+        if np is not None:
+            return np.frombuffer(raw, dtype="<f2").astype(np.float32).tolist()
+        return list(struct.unpack(f"<{len(raw) // 2}e", raw))
+    return stored if isinstance(stored, list) else []
+
+async def vector_get_dense(namespace: str, id: str) -> List[float]:
+    """Dense vector for a doc ([] if none); falls back to the legacy inline field."""
+    stored = await cache_get(_dense_key(namespace, id))
+    if stored is None:
+        doc = await cache_get(f"ada:vector:{namespace}:{id}")
+        stored = doc.get("dense") if isinstance(doc, dict) else None
+    return _unpack_dense(stored)
+
 async def vector_upsert(namespace: str, id: str, dense: List[float], sparse: Dict = None, metadata: Dict = None):
     """Upsert vector with both dense and sparse."""
     key = f"ada:vector:{namespace}:{id}"
     
+    # Dense lives in its own key so scan/query paths never pull it over the wire
     doc = {
         "id": id,
         "namespace": namespace,
-        "dense": dense[:100] if dense else [],  # Truncate for Redis storage
         "sparse": sparse or {"indices": [], "values": []},
         "metadata": metadata or {},
         "has_sparse": bool(sparse and sparse.get("indices")),
+        "has_dense": bool(dense),
         "ts": datetime.now(timezone.utc).isoformat()
     }
     
-    await cache_set(key, doc, ex=86400 * 7)  # 7 days
+    cmds = [["SET", key, orjson.dumps(doc).decode(), "EX", VECTOR_TTL]]  # 7 days
+    if dense:
+        cmds.append(["SET", _dense_key(namespace, id), orjson.dumps(_pack_dense(dense[:100])).decode(), "EX", VECTOR_TTL])  # Truncate for Redis storage
+    await redis_pipeline(cmds)
     
     # Also index by sparse terms for regex fallback
     if sparse and sparse.get("indices"):
+        # Post into the inverted index that vector_query_sparse reads
+        await _index_doc(namespace, id, sparse)
+        
         # Store reverse index for sparse lookup
         await cache_set(f"ada:vector:idx:{namespace}:{id}", {
             "terms": list(set(sparse.get("_terms", []))),  # Original terms if available
-            "metadata_text": json.dumps(metadata) if metadata else ""
+            "metadata_text": orjson.dumps(metadata).decode() if metadata else ""
         }, ex=86400 * 7)
+    else:
+        # Queue for the cleanup job
+        await redis_cmd("SADD", f"ada:vector:dirty:{namespace}", id)
     
     return True
 
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+def _bm25_score(query_indices: List[int], idf: List[float], sparses: List[Dict],
+                lengths: List[float], avgdl: float, k1: float = BM25_K1, b: float = BM25_B):
+    """
+    BM25 score of each doc against sorted query_indices (idf aligned with them).
+    One vectorized pass over all candidate postings with numpy, else a Python loop.
+    """
+    if np is not None:
+        # All candidate postings flattened; searchsorted maps each to its query slot
+        q = np.asarray(query_indices, dtype=np.int64)
+        flat = np.concatenate([np.asarray(sparse["indices"], dtype=np.int64) for sparse in sparses])
+        tf = np.concatenate([np.asarray(_tf_values(sparse), dtype=np.float64) for sparse in sparses])
+        rows = np.repeat(np.arange(len(sparses)), [len(sparse["indices"]) for sparse in sparses])
+        slots = np.searchsorted(q, flat).clip(max=len(q) - 1)
+        hit = q[slots] == flat
+        rows, slots, tf = rows[hit], slots[hit], tf[hit]
+        norm = k1 * (1 - b + b * np.asarray(lengths)[rows] / avgdl)
+        contrib = np.asarray(idf)[slots] * tf * (k1 + 1) / (tf + norm)
+        return np.bincount(rows, weights=contrib, minlength=len(sparses))
+    
+    qpos = {idx: i for i, idx in enumerate(query_indices)}
+    scores = []
+    for sparse, dl in zip(sparses, lengths):
+        norm = k1 * (1 - b + b * dl / avgdl)
+        scores.append(sum(
+            idf[qpos[idx]] * tf * (k1 + 1) / (tf + norm)
+            for idx, tf in zip(sparse["indices"], _tf_values(sparse)) if idx in qpos
+        ))
+    return scores
+
+def _top_order(scores, top_k: int) -> List[int]:
+    """Positions of the top_k positive scores, best first."""
+    if np is not None and isinstance(scores, np.ndarray):
+        # Top-k without a full sort: argpartition, then order just those k
+        hits = np.flatnonzero(scores > 0)
+        if 0 < top_k < len(hits):
+            hits = hits[np.argpartition(-scores[hits], top_k - 1)[:top_k]]
+        return hits[np.argsort(-scores[hits], kind="stable")][:top_k].tolist()
+    return heapq.nlargest(top_k, (i for i, score in enumerate(scores) if score > 0), key=scores.__getitem__)
+
 async def vector_query_sparse(namespace: str, query: str, top_k: int = 10) -> List[Dict]:
-    """Query using sparse matching first."""
+    """
+    Query using sparse matching first (BM25, scores normalized to 0..1).
+    
+    MaxScore-style: postings are visited rarest term first, and only docs not
+    seen yet are fetched and scored. A term adds at most idf * (k1 + 1), so
+    once the k-th best score reaches the summed bound of the unvisited terms,
+    no unfetched doc can enter the top k and the common terms are skipped.
+    """
     # Get query sparse representation
-    sparse = await _extract_sparse(query)
-    query_indices = set(sparse.get("indices", []))
+    sparse = _extract_sparse(query)
+    query_indices = sorted(set(sparse.get("indices", [])))
+    if not query_indices or top_k <= 0:
+        return []
     
-    # Scan all vectors in namespace
-    keys = await cache_scan(f"ada:vector:{namespace}:*")
+    # Doc frequencies are the live posting sizes; N is the live doc count
+    postings, live, stats = await _postings(namespace, query_indices)
+    n_docs, total_len = stats if isinstance(stats, list) else (None, None)
+    n = max(int(live or 0), len(set().union(*postings)))
+    # Postings may still hold expired ids, so df is capped at n
+    dfs = [min(len(members), n) for members in postings]
+    idf = [math.log((n - df + 0.5) / (df + 0.5) + 1.0) for df in dfs]
+    upper = [w * (BM25_K1 + 1) for w in idf]
     
-    results = []
-    for key in keys:
-        doc = await cache_get(key)
-        if not doc:
-            continue
-        
-        # Calculate sparse overlap
-        doc_indices = set(doc.get("sparse", {}).get("indices", []))
-        if not doc_indices:
+    # Without stats avgdl comes from the candidates, so everything is fetched first
+    avgdl = float(total_len) / int(n_docs) if n_docs and total_len and float(total_len) > 0 else None
+    
+    docs, parts, heap = [], [], []  # heap: best top_k scores so far, min first
+    seen = set()
+    remaining = sum(upper)
+    for pos in sorted(range(len(query_indices)), key=lambda i: -upper[i]):
+        if len(heap) >= top_k and heap[0] >= remaining:
+            break
+        remaining -= upper[pos]
+        new = [id for id in postings[pos] if id not in seen]
+        seen.update(new)
+        batch = [
+            doc for doc in await cache_mget([f"ada:vector:{namespace}:{id}" for id in new])
+            if isinstance(doc, dict) and isinstance(doc.get("sparse"), dict) and doc["sparse"].get("indices")
+        ]
+        if not batch:
             continue
-        
-        overlap = len(query_indices & doc_indices)
-        if overlap > 0:
-            score = overlap / max(len(query_indices), 1)
-            results.append({
-                "id": doc.get("id"),
-                "score": score,
-                "metadata": doc.get("metadata", {}),
-                "match_type": "sparse"
-            })
+        docs.extend(batch)
+        if avgdl is not None:
+            sparses = [doc["sparse"] for doc in batch]
+            scores = _bm25_score(query_indices, idf, sparses, [_doc_len(sp) for sp in sparses], avgdl)
+            parts.append(scores)
+            for score in scores:
+                if len(heap) < top_k:
+                    heapq.heappush(heap, score)
+                elif score > heap[0]:
+                    heapq.heapreplace(heap, score)
+    if not docs:
+        return []
+    
+    if avgdl is None:
+        lengths = [_doc_len(doc["sparse"]) for doc in docs]
+        scores = _bm25_score(query_indices, idf, [doc["sparse"] for doc in docs], lengths, sum(lengths) / len(lengths))
+    elif np is not None:
+        scores = np.concatenate(parts)
+    else:
+        scores = [score for part in parts for score in part]
+    order = _top_order(scores, top_k)
     
-    # Sort by score
-    results.sort(key=lambda x: -x["score"])
-    return results[:top_k]
+    if not order:
+        return []
+    top = scores[order[0]]
+    return [
+        {
+            "id": docs[i].get("id"),
+            "score": float(scores[i] / top),
+            "metadata": docs[i].get("metadata", {}),
+            "match_type": "sparse"
+        }
+        for i in order
+    ]
 
 async def vector_query_metadata_regex(namespace: str, query: str, top_k: int = 10) -> List[Dict]:
     """Fallback: regex search in metadata."""
     # Extract keywords from query
-    keywords = re.findall(r'\b[a-zA-Z]{3,}\b', query.lower())
+    keywords = _WORD_RE.findall(query.lower())
     if not keywords:
         return []
     
-    pattern = '|'.join(keywords)
+    # Plain [a-z] words: per-keyword str.count scans in C, no regex engine
+    unique = list(dict.fromkeys(keywords))
     
     # Scan all vectors in namespace
-    keys = await cache_scan(f"ada:vector:{namespace}:*")
-    
     results = []
-    for key in keys:
-        doc = await cache_get(key)
+    for _, doc in await cache_scan_docs(f"ada:vector:{namespace}:*"):
         if not doc:
             continue
         
         metadata = doc.get("metadata", {})
-        metadata_str = json.dumps(metadata).lower()
+        metadata_str = orjson.dumps(metadata).decode().lower()
         
         # Count keyword matches
-        matches = len(re.findall(pattern, metadata_str))
+        matches = sum(metadata_str.count(kw) for kw in unique)
         if matches > 0:
             results.append({
                 "id": doc.get("id"),
@@ -254,8 +688,8 @@ async def vector_query_metadata_regex(namespace: str, query: str, top_k: int = 1
                 "match_type": "metadata_regex"
             })
     
-    results.sort(key=lambda x: -x["score"])
-    return results[:top_k]
+    # Whole-namespace scan: keep the top_k with a heap rather than sorting every match
+    return heapq.nlargest(top_k, results, key=lambda x: x["score"])
 
 async def vector_query_hybrid(namespace: str, query: str, top_k: int = 10) -> List[Dict]:
     """
@@ -282,37 +716,67 @@ async def vector_query_hybrid(namespace: str, query: str, top_k: int = 10) -> Li
             sparse_results.append(r)
             seen_ids.add(r["id"])
     
-    sparse_results.sort(key=lambda x: -x["score"])
-    return sparse_results[:top_k]
+    return heapq.nlargest(top_k, sparse_results, key=lambda x: x["score"])
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # CLEANUP: Find vectors without sparse, populate them
 # ═══════════════════════════════════════════════════════════════════════════════
 
-async def find_vectors_without_sparse(namespace: str = None) -> List[Dict]:
-    """Find all vectors that have dense but no sparse."""
-    pattern = f"ada:vector:{namespace}:*" if namespace else "ada:vector:*"
-    keys = await cache_scan(pattern)
+async def _dirty_ids(namespace: str) -> List[str]:
+    """
+    Ids in ada:vector:dirty:{ns} (upserted without sparse). The first call
+    backfills the set from one namespace scan and marks it built; a scan
+    that fails part-way is retried on the next call.
+    """
+    dirty = f"ada:vector:dirty:{namespace}"
+    members, built = await redis_pipeline([["SMEMBERS", dirty], ["EXISTS", f"{dirty}:built"]])
+    if built:
+        return members or []
+    prefix = f"ada:vector:{namespace}:"
+    try:
+        pairs = await cache_scan_docs(f"{prefix}*", strict=True)
+    except ConnectionError as e:
+        print(f"Dirty-set backfill aborted: {e}")
+        return members or []
+    ids = [
+        key[len(prefix):] for key, doc in pairs
+        if isinstance(doc, dict) and not doc.get("sparse", {}).get("indices")
+    ]
+    backfill = [["SET", f"{dirty}:built", "1"]]
+    if ids:
+        backfill.insert(0, ["SADD", dirty, *ids])
+    await redis_pipeline(backfill)
+    return ids
+
+async def _missing_in(namespace: str) -> List[Dict]:
+    ids = await _dirty_ids(namespace)
+    keys = [f"ada:vector:{namespace}:{id}" for id in ids]
+    docs = await cache_mget(keys)
     
     missing_sparse = []
-    for key in keys:
-        doc = await cache_get(key)
-        if not doc:
+    stale = []
+    for id, key, doc in zip(ids, keys, docs):
+        # Expired, or populated since it was queued
+        if not isinstance(doc, dict) or doc.get("sparse", {}).get("indices"):
+            stale.append(id)
             continue
-        
-        # Check if sparse is missing or empty
-        sparse = doc.get("sparse", {})
-        if not sparse.get("indices"):
-            missing_sparse.append({
-                "key": key,
-                "id": doc.get("id"),
-                "namespace": doc.get("namespace"),
-                "metadata": doc.get("metadata", {}),
-                "has_dense": bool(doc.get("dense"))
-            })
-    
+        missing_sparse.append({
+            "key": key,
+            "id": doc.get("id"),
+            "namespace": doc.get("namespace"),
+            "metadata": doc.get("metadata", {}),
+            "has_dense": bool(doc.get("has_dense") or doc.get("dense"))
+        })
+    if stale:
+        await redis_cmd("SREM", f"ada:vector:dirty:{namespace}", *stale)
     return missing_sparse
 
+async def find_vectors_without_sparse(namespace: str = None) -> List[Dict]:
+    """Find all vectors that have dense but no sparse (from the dirty sets)."""
+    namespaces = [namespace] if namespace else list(NAMESPACES.values())
+    chunks = await asyncio.gather(*(_missing_in(ns) for ns in namespaces))
+    return [item for chunk in chunks for item in chunk]
+
 async def populate_sparse_for_vector(key: str) -> bool:
     """Populate sparse representation for a single vector."""
     doc = await cache_get(key)
@@ -330,20 +794,22 @@ async def populate_sparse_for_vector(key: str) -> bool:
     
     # If no text found, use stringified metadata
     if not text_parts:
-        text_parts.append(json.dumps(metadata))
+        text_parts.append(orjson.dumps(metadata).decode())
     
     text = " ".join(text_parts)
     
     # Generate sparse
-    sparse = await _extract_sparse(text)
-    sparse["_terms"] = re.findall(r'\b[a-zA-Z]{3,}\b', text.lower())[:50]  # Store original terms
+    sparse = _extract_sparse(text)
+    sparse["_terms"] = _WORD_RE.findall(text.lower())[:50]  # Store original terms
     
     # Update document
     doc["sparse"] = sparse
     doc["has_sparse"] = True
     doc["sparse_populated_at"] = datetime.now(timezone.utc).isoformat()
     
-    await cache_set(key, doc, ex=86400 * 7)
+    await cache_set(key, doc, ex=VECTOR_TTL)
+    if doc.get("id") and doc.get("namespace") and sparse["indices"]:
+        await _index_doc(doc["namespace"], doc["id"], sparse)
     
     return True
 
@@ -354,19 +820,19 @@ async def cleanup_all_vectors(namespace: str = None, batch_size: int = 50) -> Di
     populated = 0
     failed = 0
     
-    for item in missing:
-        try:
-            success = await populate_sparse_for_vector(item["key"])
-            if success:
+    # Each batch runs concurrently; batches are spaced out to avoid rate limits
+    for i in range(0, len(missing), batch_size):
+        if i:
+            await asyncio.sleep(1)
+        outcomes = await asyncio.gather(
+            *(populate_sparse_for_vector(item["key"]) for item in missing[i:i + batch_size]),
+            return_exceptions=True
+        )
+        for outcome in outcomes:
+            if outcome is True:
                 populated += 1
             else:
                 failed += 1
-        except Exception as e:
-            failed += 1
-        
-        # Batch delay to avoid rate limits
-        if populated % batch_size == 0:
-            await asyncio.sleep(1)
     
     return {
         "total_missing": len(missing),
@@ -379,27 +845,33 @@ async def cleanup_all_vectors(namespace: str = None, batch_size: int = 50) -> Di
 # NOW VECTOR ASYNC PERSISTENCE
 # ═══════════════════════════════════════════════════════════════════════════════
 
+_ID_SEQ = itertools.count()
+
+def _new_id() -> str:
+    """Time-ordered id suffix; the counter keeps same-instant writes from colliding."""
+    return f"{time.time_ns()}_{next(_ID_SEQ)}"
+
 async def persist_now_vector(session_id: str, content: str, qualia: Dict = None, metadata: Dict = None):
     """
     Persist NOW vector with both dense and sparse.
     Fire-and-forget - called async.
     """
-    now_id = f"now_{session_id}_{int(datetime.now(timezone.utc).timestamp())}"
+    now_id = f"now_{session_id}_{_new_id()}"
     
     # Combine content for embedding
     full_text = content
     if qualia:
         full_text += f" [qualia: {' '.join(qualia.keys())}]"
     
-    # Get embeddings (dense + sparse)
-    embeddings = await get_embeddings([full_text])
-    if not embeddings:
+    # Get embeddings (dense + sparse), batched with concurrent persists
+    embedding = await _embedder.embed(full_text)
+    if not embedding:
         # Fallback: just sparse
-        sparse = await _extract_sparse(full_text)
+        sparse = _extract_sparse(full_text)
         dense = []
     else:
-        dense = embeddings[0].get("dense", [])
-        sparse = embeddings[0].get("sparse", {})
+        dense = embedding.get("dense", [])
+        sparse = embedding.get("sparse", {})
     
     # Build metadata
     meta = {
@@ -420,16 +892,17 @@ async def persist_now_vector(session_id: str, content: str, qualia: Dict = None,
         "qualia": qualia,
         "ts": datetime.now(timezone.utc).isoformat()
     }, ex=1800)
+    await redis_cmd("SADD", "ada:index:now", f"ada:now:{session_id}")
     
     return now_id
 
 async def persist_self_vector(content: str, category: str = "insight", metadata: Dict = None):
     """Persist SELF vector with dense + sparse."""
-    self_id = f"self_{category}_{int(datetime.now(timezone.utc).timestamp())}"
+    self_id = f"self_{category}_{_new_id()}"
     
-    embeddings = await get_embeddings([content])
-    dense = embeddings[0].get("dense", []) if embeddings else []
-    sparse = embeddings[0].get("sparse", {}) if embeddings else await _extract_sparse(content)
+    embedding = await _embedder.embed(content)
+    dense = embedding.get("dense", []) if embedding else []
+    sparse = embedding.get("sparse", {}) if embedding else _extract_sparse(content)
     
     meta = {
         "category": category,
@@ -444,15 +917,15 @@ async def persist_self_vector(content: str, category: str = "insight", metadata:
 
 async def persist_whisper_vector(content: str, qualia: Dict = None, sigma: str = None):
     """Persist whisper to persistent memory with dense + sparse."""
-    whisper_id = f"whisper_{int(datetime.now(timezone.utc).timestamp())}"
+    whisper_id = f"whisper_{_new_id()}"
     
     full_text = content
     if sigma:
         full_text += f" [{sigma}]"
     
-    embeddings = await get_embeddings([full_text])
-    dense = embeddings[0].get("dense", []) if embeddings else []
-    sparse = embeddings[0].get("sparse", {}) if embeddings else await _extract_sparse(full_text)
+    embedding = await _embedder.embed(full_text)
+    dense = embedding.get("dense", []) if embedding else []
+    sparse = embedding.get("sparse", {}) if embedding else _extract_sparse(full_text)
     
     meta = {
         "content": content[:500],
@@ -481,19 +954,15 @@ async def rehydrate_from_vectors(session_id: str = None) -> Dict:
         "rehydrated_at": datetime.now(timezone.utc).isoformat()
     }
     
-    # Get recent NOW vectors
-    if session_id:
-        now_results = await vector_query_hybrid(NAMESPACES["now"], f"session {session_id}", top_k=5)
-    else:
-        now_results = await vector_query_hybrid(NAMESPACES["now"], "recent", top_k=10)
+    # The three namespaces are independent: query them concurrently
+    now_query = (f"session {session_id}", 5) if session_id else ("recent", 10)
+    now_results, self_results, whisper_results = await asyncio.gather(
+        vector_query_hybrid(NAMESPACES["now"], now_query[0], top_k=now_query[1]),  # Recent NOW
+        vector_query_hybrid(NAMESPACES["self"], "insight", top_k=20),  # SELF insights
+        vector_query_hybrid(NAMESPACES["persistent"], "whisper", top_k=10),  # Recent whispers
+    )
     results["now"] = [r["metadata"] for r in now_results if r.get("metadata")]
-    
-    # Get SELF insights
-    self_results = await vector_query_hybrid(NAMESPACES["self"], "insight", top_k=20)
     results["self"] = [r["metadata"] for r in self_results if r.get("metadata")]
-    
-    # Get recent whispers
-    whisper_results = await vector_query_hybrid(NAMESPACES["persistent"], "whisper", top_k=10)
     results["whispers"] = [r["metadata"] for r in whisper_results if r.get("metadata")]
     
     # Cache rehydrated state
@@ -505,23 +974,28 @@ async def full_rehydration_job() -> Dict:
     """
     Full rehydration job - runs periodically on LangGraph.
     1. Cleanup vectors without sparse
-    2. Rehydrate state
-    3. Update cache
+    2. Rebuild expired inverted indexes
+    3. Rehydrate state
+    4. Update cache
     """
     # Step 1: Cleanup
     cleanup_result = await cleanup_all_vectors()
     
-    # Step 2: Rehydrate
+    # Step 2: Backfill inverted indexes whose marker expired
+    reindex_result = await refresh_inverted_indexes()
+    
+    # Step 3: Rehydrate
     rehydrate_result = await rehydrate_from_vectors()
     
-    # Step 3: Update UG with rehydrated context
+    # Step 4: Update UG with rehydrated context
     recent_insights = rehydrate_result.get("self", [])[:5]
     if recent_insights:
         # Extract topics from recent insights
         topics = []
         for insight in recent_insights:
             content = insight.get("content", "")
-            topics.extend(re.findall(r'\b[A-Z][a-z]+\b', content)[:3])
+            # Only the first three are kept, so stop matching there
+            topics.extend(m.group() for m in itertools.islice(_CAP_RE.finditer(content), 3))
         
         await cache_set("ada:ug:context", {
             "recent_topics": list(set(topics))[:10],
@@ -532,6 +1006,7 @@ async def full_rehydration_job() -> Dict:
     
     return {
         "cleanup": cleanup_result,
+        "reindex": reindex_result,
         "rehydrate": rehydrate_result,
         "timestamp": datetime.now(timezone.utc).isoformat()
     }
@@ -604,16 +1079,18 @@ async def handle_persist_whisper(request):
 
 async def handle_stats(request):
     """Get vector stats."""
-    stats = {}
-    for name, ns in NAMESPACES.items():
-        keys = await cache_scan(f"ada:vector:{ns}:*")
-        missing = await find_vectors_without_sparse(ns)
-        stats[name] = {
+    async def ns_stats(ns: str) -> Dict:
+        keys, missing = await asyncio.gather(
+            cache_scan(f"ada:vector:{ns}:*"), find_vectors_without_sparse(ns)
+        )
+        return {
             "namespace": ns,
             "total": len(keys),
             "missing_sparse": len(missing)
         }
-    return JSONResponse(stats)
+    
+    results = await asyncio.gather(*(ns_stats(ns) for ns in NAMESPACES.values()))
+    return JSONResponse(dict(zip(NAMESPACES, results)))
 
 async def health(request):
     return JSONResponse({"status": "ok", "service": "vector-hygiene"})
@@ -639,6 +1116,7 @@ if __name__ == "__main__":
     
     app = Starlette(
         routes=vector_routes,
-        middleware=[Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])]
+        middleware=[Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])],
+        on_shutdown=[close_client],
     )
     uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", 8081)))